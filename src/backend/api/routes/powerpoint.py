@@ -255,7 +255,7 @@ async def get_powerpoint_slides(
             logger.error(f"Error fetching PowerPoint record: {e}")
             raise PowerPointNotFoundError(f"PowerPoint with ID {ppt_id} not found")
 
-        logger.info(f"Powerpoint details: {powerpoint_record}")
+        logger.debug("Powerpoint details: %s", powerpoint_record)
         
         # Get number of slides from the record, or attempt to discover them
         number_of_slides = powerpoint_record.number_of_slides
@@ -353,7 +353,8 @@ async def generate_video_powerpoint(
         dict: Response containing the status of the video generation request
     """
     try:
-        logger.info(f"Received video request data: {video_request.model_dump()}")
+        # Lazy %-formatting: the request (every slide script) is only rendered when DEBUG is enabled
+        logger.debug("Received video request data: %s", video_request)
 
         # Parse the video generation request
         ppt_id = video_request.ppt_id
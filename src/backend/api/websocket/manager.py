@@ -1,6 +1,6 @@
 import asyncio
-import json
 import logging
+import orjson # type: ignore
 from datetime import datetime
 from typing import Dict, List, Optional
 from fastapi import WebSocket # type: ignore
@@ -149,10 +149,8 @@ class PowerPointProgressManager:
         if self.is_polling and self.polling_task:
             self.is_polling = False
             self.polling_task.cancel()
-            try:
-                await self.polling_task
-            except asyncio.CancelledError:
-                pass
+            # Wait for the task to finish without swallowing a cancellation of the caller itself
+            await asyncio.wait({self.polling_task})
             logger.info("Stopped database polling for PowerPoint progress")
     
     async def _poll_database(self):
@@ -416,10 +414,12 @@ class PowerPointProgressManager:
             return
             
         dead_connections = []
+        # Serialize once for all connections
+        message_text = orjson.dumps(message).decode()
         
         for websocket in self.active_connections[ppt_id]:
             try:
-                await websocket.send_text(json.dumps(message))
+                await websocket.send_text(message_text)
                 logger.debug(f"Sent message to PPT {ppt_id} connection: {message['type']}")
             except Exception as e:
                 logger.error(f"Error sending message to WebSocket: {e}")
@@ -436,10 +436,12 @@ class PowerPointProgressManager:
             return
             
         dead_connections = []
+        # Serialize once for all connections
+        message_text = orjson.dumps(message).decode()
         
         for websocket in self.video_connections[video_key]:
             try:
-                await websocket.send_text(json.dumps(message))
+                await websocket.send_text(message_text)
                 logger.info(f"Sent video message to {video_key}: {message['type']}")
             except Exception as e:
                 logger.error(f"Error sending message to video WebSocket: {e}")
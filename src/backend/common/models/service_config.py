@@ -12,7 +12,9 @@ class ServiceBusConfig:
     """Configuration for Service Bus source"""
     max_wait_time: int = 60  # Default max wait time for message processing
     max_message_count: int = 1  # Default max messages to process at once
+    prefetch_count: int = 0  # Messages buffered ahead of processing; keep prefetch_count x processing time below the lock duration
     retry_delay: int = 5  # Default delay between retries in seconds
+    max_restart_delay: int = 60  # Upper bound in seconds on the backoff between listener restarts after connection errors
     use_lock_renewer: bool = True  # Whether to use lock renewer for long-running operations
     use_delete_receiver: bool = False  # Whether to delete the message after receiving it
     
@@ -18,10 +18,11 @@ class BaseExtractorService(BaseService):
     
     async def _initialize(self):
         """Initialize extraction-specific resources"""
-        self.blob_service = BlobStorageService(self.settings.storage_account_url)
+        self.blob_service = BlobStorageService(self.settings.storage_account_url, credential=self.credential)
         self.cosmos_service = CosmosDBService(
             self.settings.cosmos_db_endpoint,
             self.settings.cosmos_db_database_name,
+            credential=self.credential,
         )
     
     async def handle_message(self, message_data: Dict) -> None:
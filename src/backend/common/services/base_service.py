@@ -1,16 +1,23 @@
 import asyncio
-import sys
-import json
 import signal
+import time
+import orjson # type: ignore
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List
+from urllib.parse import urlparse
 from azure.servicebus import ServiceBusReceivedMessage # type: ignore
+from azure.servicebus.exceptions import ServiceBusConnectionError, ServiceBusCommunicationError # type: ignore
+from azure.identity.aio import DefaultAzureCredential # type: ignore
 
 from .service_bus import ServiceBusService
 from ..models.service_config import ServiceBusConfig, QueueConfig, SubscriptionConfig
 from ..utils.config import Settings
 from ..utils.logging import setup_logging
 
+# Token scopes of the Service Bus and Blob Storage clients, pre-fetched at startup
+SERVICE_BUS_TOKEN_SCOPE = "https://servicebus.azure.net/.default"
+STORAGE_TOKEN_SCOPE = "https://storage.azure.com/.default"
+
 
 class BaseService(ABC):
     """Unified base class for all services that combines lifecycle management and message handling"""
@@ -30,41 +37,112 @@ class BaseService(ABC):
         # Setup logging
         self.logger = setup_logging(f"{service_name.lower().replace(' ', '_')}_main")
         
+        # One credential shared by every Azure client of the service, so tokens are cached once
+        self.credential = DefaultAzureCredential()
+        
         # Initialize Service Bus
-        self.service_bus = ServiceBusService(settings.service_bus_fqdn)
+        self.service_bus = ServiceBusService(settings.service_bus_fqdn, credential=self.credential)
         
         # Service runner state
         self.service_instance = None
         self._is_running = False
+        # Set by stop_processing, so the backoff between listener restarts ends as soon as a stop is requested
+        self._stop_event = None
     
     async def run(self):
         """Run the service with full lifecycle management (replaces ServiceRunner.run)"""
+        # Set before the signal handlers are installed, so a signal during initialization is not overwritten
+        self._is_running = True
+        self._stop_event = asyncio.Event()
         try:
             # Setup signal handlers for graceful shutdown
-            signal.signal(signal.SIGINT, self._signal_handler)
-            signal.signal(signal.SIGTERM, self._signal_handler)
+            self._install_signal_handlers()
             
             self.logger.info(f"Starting {self.service_name}")
             self.logger.info(str(self.service_bus_config))
             
-            # Initialize service-specific resources
-            await self._initialize()
-            
-            # Start processing messages
-            await self._start_message_processing()
+            # Initialize service-specific resources and close them again on exit
+            async with self:
+                # Start processing messages
+                await self._start_message_processing()
             
         except KeyboardInterrupt:
             self.logger.info("Received keyboard interrupt")
         except Exception as e:
             self.logger.error(f"Fatal error in {self.service_name}: {str(e)}")
             raise
-        finally:
+    
+    async def __aenter__(self):
+        """Initialize service-specific resources when entering the async context"""
+        try:
+            await self._initialize()
+            await self._warm_up_credential()
+        except BaseException:
+            # __aexit__ is not called when entering fails, so release partially created clients here
             await self._cleanup()
+            raise
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Close Azure clients and service resources when leaving the async context"""
+        await self._cleanup()
+    
+    def _token_scopes(self) -> List[str]:
+        """Token scopes used by the service's Azure clients - subclasses without a blob or Cosmos client override this"""
+        return [SERVICE_BUS_TOKEN_SCOPE, STORAGE_TOKEN_SCOPE, self._cosmos_token_scope()]
+    
+    def _cosmos_token_scope(self) -> str:
+        """Token scope of the configured Cosmos DB account"""
+        cosmos_url = urlparse(self.settings.cosmos_db_endpoint)
+        return f"{cosmos_url.scheme}://{cosmos_url.hostname}/.default"
+    
+    async def _warm_up_credential(self):
+        """Acquire tokens for all scopes up front so the first message does not pay for the auth round-trips"""
+        scopes = self._token_scopes()
+        results = await asyncio.gather(
+            *(self.credential.get_token(scope) for scope in scopes),
+            return_exceptions=True
+        )
+        for scope, result in zip(scopes, results):
+            if isinstance(result, Exception):
+                # Not fatal: the client will request the token again on first use
+                self.logger.warning("Could not pre-fetch token for scope %s: %s", scope, result)
     
     async def _start_message_processing(self):
-        """Start processing messages from Service Bus queue or subscription"""
-        self._is_running = True
+        """Start processing messages from Service Bus queue or subscription
         
+        Transient connection failures restart the listener with capped exponential backoff,
+        keeping the service's clients, credential and caches instead of failing the process.
+        """
+        if not self._is_running:
+            # Stopped while the service was still initializing
+            self.logger.info(f"{self.service_name} was stopped before it started processing messages")
+            return
+        restart_delay = self.service_bus_config.retry_delay
+        
+        while True:
+            started_at = time.monotonic()
+            try:
+                await self._listen_for_messages()
+                return
+            except (ServiceBusConnectionError, ServiceBusCommunicationError, OSError) as e:
+                if not self._is_running:
+                    raise
+                # A listener that ran for a while failed for a new reason, so start backing off from scratch
+                if time.monotonic() - started_at > self.service_bus_config.max_restart_delay:
+                    restart_delay = self.service_bus_config.retry_delay
+                self.logger.warning(f"Message listener stopped on a connection error, restarting in {restart_delay} seconds: {str(e)}")
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=restart_delay)
+                except asyncio.TimeoutError:
+                    pass
+                restart_delay = min(restart_delay * 2, self.service_bus_config.max_restart_delay)
+                if not self._is_running:
+                    # Stopped while waiting to restart
+                    return
+    
+    async def _listen_for_messages(self):
+        """Listen to the configured Service Bus queue or subscription until listening is stopped"""
         try:
             if isinstance(self.service_bus_config, QueueConfig):
                 await self.service_bus.listen_to_queue(
@@ -72,6 +150,7 @@ class BaseService(ABC):
                     message_handler=self._handle_message_wrapper,
                     max_wait_time=self.service_bus_config.max_wait_time,
                     max_message_count=self.service_bus_config.max_message_count,
+                    prefetch_count=self.service_bus_config.prefetch_count,
                     retry_delay=self.service_bus_config.retry_delay,
                     use_lock_renewer=self.service_bus_config.use_lock_renewer,
                     use_delete_receiver=self.service_bus_config.use_delete_receiver
@@ -83,6 +162,7 @@ class BaseService(ABC):
                     message_handler=self._handle_message_wrapper,
                     max_wait_time=self.service_bus_config.max_wait_time,
                     max_message_count=self.service_bus_config.max_message_count,
+                    prefetch_count=self.service_bus_config.prefetch_count,
                     retry_delay=self.service_bus_config.retry_delay,
                     use_lock_renewer=self.service_bus_config.use_lock_renewer,
                     use_delete_receiver=self.service_bus_config.use_delete_receiver
@@ -94,39 +174,48 @@ class BaseService(ABC):
     async def _handle_message_wrapper(self, message: ServiceBusReceivedMessage):
         """Wrapper for message handling with common error handling and parsing"""
         try:
-            # Parse message body
-            message_body = str(message)
-            message_data = json.loads(message_body)
+            # Parse the raw body bytes directly instead of decoding them to a str first
+            message_body = b"".join(message.body)
+            message_data = orjson.loads(message_body)
             
-            self.logger.info(f"Processing message: {message_data}")
+            # Full payloads (e.g. slide scripts) are only formatted when debug logging is enabled
+            self.logger.debug("Processing message: %s", message_data)
             
             # Call the service-specific message handler
             await self.handle_message(message_data)
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             self.logger.error(f"Failed to parse message as JSON: {str(e)}")
             raise
         except Exception as e:
             self.logger.error(f"Error processing message: {str(e)}")
             raise
     
-    def _signal_handler(self, signum, frame):
-        """Handle shutdown signals"""
-        self.logger.info(f"Received signal {signum}")
-        asyncio.create_task(self._shutdown_handler())
-        sys.exit(0)
+    def _install_signal_handlers(self):
+        """Stop processing gracefully on SIGINT/SIGTERM
+        
+        Stopping lets the listener finish and settle in-flight messages, after which run() leaves
+        the async context and closes the clients, instead of exiting in the middle of processing.
+        """
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._signal_handler, sig)
+            except NotImplementedError:
+                # Windows event loops do not support add_signal_handler
+                signal.signal(sig, lambda signum, frame: loop.call_soon_threadsafe(self._signal_handler, signum))
     
-    async def _shutdown_handler(self):
-        """Handle graceful shutdown"""
-        self.logger.info("Shutdown signal received, cleaning up...")
-        self._is_running = False
-        await self._cleanup()
-        self.logger.info("Shutdown complete")
+    def _signal_handler(self, signum):
+        """Handle shutdown signals"""
+        self.logger.info(f"Received signal {signum}, shutting down gracefully...")
+        self.stop_processing()
     
     def stop_processing(self):
         """Stop processing messages"""
         self.logger.info(f"Stopping {self.service_name}")
         self._is_running = False
+        if self._stop_event is not None:
+            self._stop_event.set()
         self.service_bus.stop_listening()
     
     @abstractmethod
@@ -150,6 +239,7 @@ class BaseService(ABC):
             await self.cleanup()
             if self.service_bus:
                 await self.service_bus.close()
+            await self.credential.close()
         except Exception as e:
             self.logger.error(f"Error during cleanup: {str(e)}")
     
@@ -158,5 +248,11 @@ class BaseService(ABC):
         pass
 
 def run_service(service_instance):
-    """Convenience function to run a service instance"""
-    asyncio.run(service_instance.run())
\ No newline at end of file
+    """Convenience function to run a service instance, on uvloop when it is installed"""
+    try:
+        import uvloop # type: ignore
+    except ImportError:
+        # uvloop is not available on Windows
+        asyncio.run(service_instance.run())
+    else:
+        uvloop.run(service_instance.run())
\ No newline at end of file
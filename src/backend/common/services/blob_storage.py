@@ -3,26 +3,65 @@ from azure.storage.blob import generate_blob_sas, BlobSasPermissions # type: ign
 from azure.identity.aio import DefaultAzureCredential # type: ignore
 from azure.core.exceptions import AzureError # type: ignore
 from datetime import datetime, timedelta
+from typing import List, Optional
+import asyncio
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# Transfer sizes used for blob downloads; large ranges keep the number of HTTP round-trips
+# and disk writes low when landing video files on local storage
+MAX_SINGLE_GET_SIZE = 64 * 1024 * 1024
+MAX_CHUNK_GET_SIZE = 16 * 1024 * 1024
+# Number of ranges/blocks transferred in parallel when streaming a blob to or from a local file
+MAX_TRANSFER_CONCURRENCY = 4
+# User delegation keys are minted with this much validity beyond the requested SAS expiry, so one
+# key keeps signing new SAS tokens for a while instead of costing a round-trip per URL
+USER_DELEGATION_KEY_EXTRA_VALIDITY = timedelta(hours=6)
+
 
 class BlobStorageService:
-    def __init__(self, account_url: str):
+    def __init__(self, account_url: str, credential: Optional[DefaultAzureCredential] = None):
         self.account_url = account_url
-        self.credential = DefaultAzureCredential()
+        # Reuse the caller's credential (and its token cache) when given; only close credentials we created
+        self._owns_credential = credential is None
+        self.credential = credential or DefaultAzureCredential()
         self.blob_service_client = None
+        # Cached user delegation key used to sign SAS tokens, and the time it stops being valid
+        self._user_delegation_key = None
+        self._user_delegation_key_expiry = None
+        self._user_delegation_key_lock = asyncio.Lock()
     
     async def _get_client(self):
         """Get or create the async blob service client"""
         if self.blob_service_client is None:
             self.blob_service_client = BlobServiceClient(
                 account_url=self.account_url, 
-                credential=self.credential
+                credential=self.credential,
+                max_single_get_size=MAX_SINGLE_GET_SIZE,
+                max_chunk_get_size=MAX_CHUNK_GET_SIZE
             )
         return self.blob_service_client
     
+    async def _get_user_delegation_key(self, client, expiry_time: datetime):
+        """Return a cached user delegation key valid until at least expiry_time, minting a new one if needed"""
+        if self._user_delegation_key is not None and self._user_delegation_key_expiry >= expiry_time:
+            return self._user_delegation_key
+        
+        async with self._user_delegation_key_lock:
+            # Another caller may have minted a suitable key while we waited for the lock
+            if self._user_delegation_key is None or self._user_delegation_key_expiry < expiry_time:
+                key_start_time = datetime.utcnow()
+                key_expiry_time = expiry_time + USER_DELEGATION_KEY_EXTRA_VALIDITY
+                self._user_delegation_key = await client.get_user_delegation_key(
+                    key_start_time=key_start_time,
+                    key_expiry_time=key_expiry_time
+                )
+                self._user_delegation_key_expiry = key_expiry_time
+                logger.info(f"Obtained user delegation key valid until {key_expiry_time.isoformat()}")
+            return self._user_delegation_key
+    
     async def upload_file(self, container_name: str, blob_name: str, file_data: bytes) -> str:
         """ Upload file to blob storage
 
@@ -56,6 +95,46 @@ class BlobStorageService:
             logger.error(f"Unexpected error uploading file to blob storage: {e}")
             raise
     
+    async def upload_from_file(self, container_name: str, blob_name: str, file_path: str) -> str:
+        """ Upload a local file to blob storage, letting the SDK read and upload it in parallel blocks
+
+        Args:
+            container_name (str): The name of the container in blob storage.
+            blob_name (str): The name of the blob (file) to be created in the container.
+            file_path (str): The local path of the file to be uploaded.
+
+        Returns:
+            str: The URL of the uploaded blob in blob storage.
+        """
+        try:
+            client = await self._get_client()
+            blob_client = client.get_blob_client(
+                container=container_name, 
+                blob=blob_name
+            )
+            
+            # Upload the file
+            with open(file_path, 'rb') as f:
+                # Passing the length lets the SDK plan the block upload without probing the stream
+                await blob_client.upload_blob(
+                    f,
+                    length=os.fstat(f.fileno()).st_size,
+                    overwrite=True,
+                    max_concurrency=MAX_TRANSFER_CONCURRENCY
+                )
+            
+            logger.info(f"File uploaded successfully to blob storage: {blob_name}")
+            
+            # Return the blob URL
+            return blob_client.url
+            
+        except AzureError as e:
+            logger.error(f"Azure error uploading file to blob storage: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error uploading file to blob storage: {e}")
+            raise
+    
     async def download_file(self, container_name: str, blob_name: str) -> bytes:
         """ Download file from blob storage
 
@@ -86,6 +165,38 @@ class BlobStorageService:
             logger.error(f"Unexpected error downloading file from blob storage: {e}")
             raise
     
+    async def download_to_file(self, container_name: str, blob_name: str, file_path: str) -> int:
+        """ Download file from blob storage directly into a local file
+
+        Args:
+            container_name (str): The name of the container in blob storage.
+            blob_name (str): The name of the blob (file) to be downloaded from the container.
+            file_path (str): The local path the blob content is written to.
+
+        Returns:
+            int: The number of bytes written to the local file.
+        """
+        try:
+            client = await self._get_client()
+            blob_client = client.get_blob_client(
+                container=container_name, 
+                blob=blob_name
+            )
+            
+            download_stream = await blob_client.download_blob(max_concurrency=MAX_TRANSFER_CONCURRENCY)
+            with open(file_path, 'wb') as f:
+                bytes_written = await download_stream.readinto(f)
+            
+            logger.info(f"File downloaded successfully from blob storage: {blob_name} -> {file_path}")
+            return bytes_written
+            
+        except AzureError as e:
+            logger.error(f"Azure error downloading file from blob storage: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error downloading file from blob storage: {e}")
+            raise
+    
     async def file_exists(self, container_name: str, blob_name: str) -> bool:
         """ Check if a file exists in blob storage
 
@@ -164,10 +275,7 @@ class BlobStorageService:
         
             try:
                 # Try to get user delegation key for managed identity/service principal auth
-                user_delegation_key = await client.get_user_delegation_key(
-                    key_start_time=start_time,
-                    key_expiry_time=expiry_time
-                )
+                user_delegation_key = await self._get_user_delegation_key(client, expiry_time)
             
                 # Generate SAS token with user delegation key
                 sas_token = generate_blob_sas(
@@ -214,7 +322,58 @@ class BlobStorageService:
             # Return the blob URL without SAS as fallback
             return blob_client.url
     
+    async def get_blob_urls_with_sas(self, container_name: str, blob_names: List[str], expiry_hours: int = 1) -> List[str]:
+        """ Generate read-only SAS URLs for several blobs, all signed with the cached user delegation key
+
+        Unlike get_blob_url_with_sas, this does not fall back to unsigned URLs: callers rely on
+        the returned URLs being readable and should handle the raised error instead.
+
+        Args:
+            container_name (str): The name of the container in blob storage.
+            blob_names (List[str]): The names of the blobs to generate SAS URLs for.
+            expiry_hours (int): Hours from now when the SAS tokens expire (default: 1).
+
+        Returns:
+            List[str]: The blob URLs with SAS tokens, in the same order as blob_names.
+        """
+        try:
+            client = await self._get_client()
+            
+            start_time = datetime.utcnow()
+            expiry_time = start_time + timedelta(hours=expiry_hours)
+            
+            user_delegation_key = await self._get_user_delegation_key(client, expiry_time)
+            
+            sas_urls = []
+            for blob_name in blob_names:
+                blob_client = client.get_blob_client(
+                    container=container_name, 
+                    blob=blob_name
+                )
+                sas_token = generate_blob_sas(
+                    account_name=client.account_name,
+                    container_name=container_name,
+                    blob_name=blob_name,
+                    user_delegation_key=user_delegation_key,
+                    permission=BlobSasPermissions(read=True),
+                    expiry=expiry_time,
+                    start=start_time
+                )
+                sas_urls.append(f"{blob_client.url}?{sas_token}")
+            
+            logger.info(f"Generated {len(sas_urls)} SAS URLs with user delegation key in container: {container_name}")
+            return sas_urls
+            
+        except AzureError as e:
+            logger.error(f"Azure error generating SAS URLs for blobs: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error generating SAS URLs for blobs: {e}")
+            raise
+    
     async def close(self):
-        """Close the blob service client"""
+        """Close the blob service client and its credential"""
         if self.blob_service_client:
-            await self.blob_service_client.close()
\ No newline at end of file
+            await self.blob_service_client.close()
+        if self._owns_credential:
+            await self.credential.close()
@@ -1,34 +1,50 @@
 from azure.cosmos.aio import CosmosClient # type: ignore
 from azure.identity.aio import DefaultAzureCredential # type: ignore
 from azure.core.exceptions import AzureError # type: ignore
-from common.models.powerpoint import PowerPointModel, StatusEnum
+from azure.cosmos.exceptions import CosmosHttpResponseError # type: ignore
+from common.models.powerpoint import PowerPointModel, VideoInformationModel, StatusEnum
 from common.models.user import User, PowerPointSummary, VideoSummary
-from typing import Optional
+from typing import List, Optional, Union
 from datetime import datetime
+import json
 import logging
 from common.utils.config import Settings
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on the number of videos whose document positions are cached
+MAX_CACHED_VIDEO_POSITIONS = 1024
+
 
 class CosmosDBService:
-    def __init__(self, endpoint: str, database_name: str):
+    def __init__(self, endpoint: str, database_name: str, credential: Optional[DefaultAzureCredential] = None):
         settings = Settings()
         self.endpoint = endpoint
         self.database_name = database_name
-        self.credential = DefaultAzureCredential()
+        # Reuse the caller's credential (and its token cache) when given; only close credentials we created
+        self._owns_credential = credential is None
+        self.credential = credential or DefaultAzureCredential()
         self.ppt_container = settings.cosmos_db_ppt_container_name
         self.user_container = settings.cosmos_db_user_container_name
         self.client = None
         self.database = None
+        self._containers = {}
+        # (ppt_id, video_id) -> (position in videoInformation, {slide index: position in slides})
+        self._video_positions = {}
     
     async def _get_container(self, container_name: str):
         """Get or create the async Cosmos client and container"""
         if self.client is None:
             self.client = CosmosClient(self.endpoint, self.credential)
             self.database = self.client.get_database_client(self.database_name)
-        self.container = self.database.get_container_client(container_name)
-        return self.container
+        container = self._containers.get(container_name)
+        if container is None:
+            container = self.database.get_container_client(container_name)
+            # Read the container once so the SDK caches its resource ID and partition key
+            # definition up front instead of resolving them on the first item operation
+            await container.read()
+            self._containers[container_name] = container
+        return container
     
     async def create_powerpoint_record(self, powerpoint: PowerPointModel) -> PowerPointModel:
         """ Create a new PowerPoint record in Cosmos DB
@@ -132,6 +148,9 @@ class CosmosDBService:
 
             # Filter out the video with the given video_id
             powerpoint.video_information = [video for video in powerpoint.video_information if video.video_id != video_id]
+            # Later videos shift position, so forget every cached position of this record
+            for key in [key for key in self._video_positions if key[0] == ppt_id]:
+                del self._video_positions[key]
 
             await self.update_powerpoint_record(powerpoint)
 
@@ -313,16 +332,120 @@ class CosmosDBService:
             logger.error(f"Unexpected error updating PowerPoint record: {e}")
             raise
 
+    def _status_patch_operations(self, status_path: str, new_status: StatusEnum, error_message: Optional[str] = None,
+                                 now: Optional[str] = None) -> list:
+        """Build the patch operations setting a StatusInformation object at status_path to new_status
+
+        now is the timestamp to record; callers patching several statuses at once pass the same one.
+        """
+        new_status = StatusEnum(new_status)
+        operations = [{"op": "set", "path": f"{status_path}/status", "value": new_status.value}]
+        
+        # Timestamps are stored the way the models serialize them (naive UTC ISO 8601)
+        if now is None:
+            now = datetime.utcnow().isoformat()
+        if new_status == StatusEnum.PROCESSING:
+            operations.append({"op": "set", "path": f"{status_path}/processedAt", "value": now})
+        elif new_status == StatusEnum.COMPLETED:
+            operations.append({"op": "set", "path": f"{status_path}/completedAt", "value": now})
+        elif new_status == StatusEnum.FAILED:
+            operations.append({"op": "set", "path": f"{status_path}/failedAt", "value": now})
+            if error_message:
+                operations.append({"op": "set", "path": f"{status_path}/errorMessage", "value": error_message})
+        return operations
+
+    async def _get_video_positions(self, ppt_id: str, user_id: str, video_id: str, refresh: bool = False):
+        """Get the position of a video in a PowerPoint record and the positions of its slides keyed by slide index
+
+        Positions only change when a video is deleted, so they are read once per video and cached.
+
+        Returns:
+            (video position, {slide index: slide position}), or None if the record or video was not found
+        """
+        key = (ppt_id, video_id)
+        if not refresh and key in self._video_positions:
+            return self._video_positions[key]
+        
+        self._video_positions.pop(key, None)
+        result = await self.get_powerpoint_record(ppt_id, user_id)
+        if not result:
+            logger.error(f"PowerPoint record not found: {ppt_id}")
+            return None
+        powerpoint_record, _ = result
+        
+        for video_position, video_info in enumerate(powerpoint_record.video_information):
+            if video_info.video_id == video_id:
+                positions = (video_position, {slide.index: position for position, slide in enumerate(video_info.slides)})
+                if len(self._video_positions) >= MAX_CACHED_VIDEO_POSITIONS:
+                    # Drop the oldest entry; its video has most likely finished processing
+                    self._video_positions.pop(next(iter(self._video_positions)))
+                self._video_positions[key] = positions
+                return positions
+        
+        logger.error(f"Video information not found for video_id: {video_id}")
+        return None
+
+    def _slide_status_operations(self, video_position: int, slide_positions: dict, slide_index: str, status_types: List[str],
+                                 new_status: StatusEnum, error_message: Optional[str] = None) -> Optional[list]:
+        """Build the patch operations setting the given statuses of a slide, or None if the slide is unknown"""
+        slide_position = slide_positions.get(slide_index)
+        if slide_position is None:
+            logger.error(f"Slide not found for index: {slide_index}")
+            return None
+        slide_path = f"/videoInformation/{video_position}/slides/{slide_position}"
+        # At most 3 operations per status type, well within the 10 operations Cosmos allows per patch
+        operations = []
+        now = datetime.utcnow().isoformat()
+        for status_type in status_types:
+            operations.extend(self._status_patch_operations(f"{slide_path}/{status_type}", new_status, error_message, now))
+        return operations
+
+    async def _patch_video(self, ppt_id: str, user_id: str, video_id: str, build_operations) -> Optional[dict]:
+        """Apply patch operations to the part of a PowerPoint record belonging to a video
+
+        Args:
+            build_operations: Called with the video position and the slide positions; returns the
+                patch operations, or None if there is nothing to patch
+
+        Returns:
+            The patched record, or None if the video or the operations were not found
+
+        The filter predicate makes the patch fail with a 412 instead of touching another video if
+        the videoInformation list changed since the positions were cached; the positions are then
+        read again and the patch retried once.
+        """
+        container = await self._get_container(self.ppt_container)
+        for refresh in (False, True):
+            positions = await self._get_video_positions(ppt_id, user_id, video_id, refresh)
+            if positions is None:
+                return None
+            
+            video_position, slide_positions = positions
+            operations = build_operations(video_position, slide_positions)
+            if operations is None:
+                return None
+            
+            try:
+                return await container.patch_item(
+                    item=ppt_id,
+                    partition_key=user_id,
+                    patch_operations=operations,
+                    filter_predicate=f"FROM c WHERE c.videoInformation[{video_position}].videoId = {json.dumps(video_id)}"
+                )
+            except CosmosHttpResponseError as e:
+                if e.status_code != 412 or refresh:
+                    raise
+                logger.warning(f"Cached position of video {video_id} in PPT {ppt_id} is stale, reloading")
+
     async def update_video_status(self, ppt_id: str, user_id: str, video_id: str, 
                                     status_type: str, new_status: StatusEnum, error_message: Optional[str] = None) -> bool:
-            """Update slide video status in PowerPoint record
+            """Update video status in PowerPoint record
     
             Args:
                 ppt_id: PowerPoint ID
                 user_id: User ID (partition key)
                 video_id: Video ID
-                slide_index: Slide index
-                status_type: Type of status to update ('status', 'generation_status', 'transformation_status')
+                status_type: Type of status to update (only 'status' exists at video level)
                 new_status: New status value (StatusEnum)
                 error_message: Error message if status is 'Failed'
         
@@ -330,59 +453,29 @@ class CosmosDBService:
                 True if update was successful, False otherwise
             """
             try:
-                # Get the PowerPoint record
-                powerpoint_record, _ = await self.get_powerpoint_record(ppt_id, user_id)
-        
-                if not powerpoint_record:
-                    logger.error(f"PowerPoint record not found: {ppt_id}")
-                    return False
-        
-                # Find the video information
-                video_info = None
-                for vi in powerpoint_record.video_information:
-                    if vi.video_id == video_id:
-                        video_info = vi
-                        break
-        
-                if not video_info:
-                    logger.error(f"Video information not found for video_id: {video_id}")
-                    return False
-        
-                # Get the status object to update
-                if status_type == "status":
-                    status_obj = video_info.status
-                elif status_type == "generation_status":
-                    status_obj = video_info.generation_status
-                elif status_type == "transformation_status":
-                    status_obj = video_info.transformation_status
-                else:
+                if status_type != "status":
                     logger.error(f"Invalid status_type: {status_type}")
                     return False
-        
-                # Update status and timestamps
-                status_obj.status = new_status
-        
-                if new_status == StatusEnum.PROCESSING:
-                    status_obj.processed_at = datetime.utcnow()
-                elif new_status == StatusEnum.COMPLETED:
-                    status_obj.completed_at = datetime.utcnow()
-                elif new_status == StatusEnum.FAILED:
-                    status_obj.failed_at = datetime.utcnow()
-                    if error_message:
-                        status_obj.error_message = error_message
-        
-                # Update the record in Cosmos DB
-                await self.update_powerpoint_record(powerpoint_record)
+                
+                # Patch only the status fields server-side instead of replacing the whole record
+                patched_item = await self._patch_video(
+                    ppt_id, user_id, video_id,
+                    lambda video_position, _: self._status_patch_operations(
+                        f"/videoInformation/{video_position}/status", new_status, error_message
+                    )
+                )
+                if patched_item is None:
+                    return False
         
                 logger.info(f"Updated {status_type} to {new_status} for PPT {ppt_id}, video {video_id}")
                 return True
         
             except Exception as e:
-                logger.error(f"Error updating slide video status: {str(e)}")
+                logger.error(f"Error updating video status: {str(e)}")
                 return False
 
     async def update_slide_video_status(self, ppt_id: str, user_id: str, video_id: str, slide_index: str, 
-                                status_type: str, new_status: StatusEnum, error_message: Optional[str] = None) -> bool:
+                                status_type: Union[str, List[str]], new_status: StatusEnum, error_message: Optional[str] = None) -> bool:
         """Update slide video status in PowerPoint record
     
         Args:
@@ -390,7 +483,8 @@ class CosmosDBService:
             user_id: User ID (partition key)
             video_id: Video ID
             slide_index: Slide index
-            status_type: Type of status to update ('status', 'generation_status', 'transformation_status')
+            status_type: Type of status to update ('status', 'generation_status', 'transformation_status'),
+                or a list of them to update together in a single patch
             new_status: New status value (StatusEnum)
             error_message: Error message if status is 'Failed'
         
@@ -398,69 +492,76 @@ class CosmosDBService:
             True if update was successful, False otherwise
         """
         try:
-            # Get the PowerPoint record
-            powerpoint_record, etag = await self.get_powerpoint_record(ppt_id, user_id)
-        
-            if not powerpoint_record:
-                logger.error(f"PowerPoint record not found: {ppt_id}")
-                return False
-        
-            # Find the video information
-            video_info = None
-            for vi in powerpoint_record.video_information:
-                if vi.video_id == video_id:
-                    video_info = vi
-                    break
-        
-            if not video_info:
-                logger.error(f"Video information not found for video_id: {video_id}")
-                return False
-        
-            # Find the slide
-            slide_video = None
-            for slide in video_info.slides:
-                if slide.index == slide_index:
-                    slide_video = slide
-                    break
-        
-            if not slide_video:
-                logger.error(f"Slide not found for index: {slide_index}")
-                return False
-        
-            # Get the status object to update
-            if status_type == "status":
-                status_obj = slide_video.status
-            elif status_type == "generation_status":
-                status_obj = slide_video.generation_status
-            elif status_type == "transformation_status":
-                status_obj = slide_video.transformation_status
-            else:
-                logger.error(f"Invalid status_type: {status_type}")
+            status_types = [status_type] if isinstance(status_type, str) else list(status_type)
+            for type_name in status_types:
+                if type_name not in ("status", "generation_status", "transformation_status"):
+                    logger.error(f"Invalid status_type: {type_name}")
+                    return False
+            
+            # Patch only the slide's status fields server-side; concurrent updates of other
+            # slides no longer overwrite each other through a full-record replace
+            patched_item = await self._patch_video(
+                ppt_id, user_id, video_id,
+                lambda video_position, slide_positions: self._slide_status_operations(
+                    video_position, slide_positions, slide_index, status_types, new_status, error_message
+                )
+            )
+            if patched_item is None:
                 return False
-        
-            # Update status and timestamps
-            status_obj.status = new_status
-        
-            if new_status == StatusEnum.PROCESSING:
-                status_obj.processed_at = datetime.utcnow()
-            elif new_status == StatusEnum.COMPLETED:
-                status_obj.completed_at = datetime.utcnow()
-            elif new_status == StatusEnum.FAILED:
-                status_obj.failed_at = datetime.utcnow()
-                if error_message:
-                    status_obj.error_message = error_message
-        
-            # Update the record in Cosmos DB
-            await self.update_powerpoint_record(powerpoint_record)
 
-            logger.info(f"Updated {status_type} to {new_status} for PPT {ppt_id}, video {video_id}, slide {slide_index}")
+            logger.info(f"Updated {', '.join(status_types)} to {new_status} for PPT {ppt_id}, video {video_id}, slide {slide_index}")
             return True
         
         except Exception as e:
             logger.error(f"Error updating slide video status: {str(e)}")
             return False
+
+    async def complete_slide_video(self, ppt_id: str, user_id: str, video_id: str, slide_index: str,
+                                   status_types: List[str]) -> Optional[VideoInformationModel]:
+        """ Mark a slide completed and increment the completed slides counter of its video in one atomic patch
+
+        Args:
+            ppt_id (str): PowerPoint ID
+            user_id (str): User ID (partition key)
+            video_id (str): Video ID
+            slide_index (str): Slide index
+            status_types (List[str]): The slide statuses to set to Completed
+
+        Returns:
+            Optional[VideoInformationModel]: The video information after the update, or None if the video or slide was not found.
+        """
+        try:
+            patched_position = None
+            
+            def build_operations(video_position, slide_positions):
+                nonlocal patched_position
+                patched_position = video_position
+                operations = self._slide_status_operations(
+                    video_position, slide_positions, slide_index, status_types, StatusEnum.COMPLETED
+                )
+                if operations is None:
+                    return None
+                return operations + [{"op": "incr", "path": f"/videoInformation/{video_position}/completedSlides", "value": 1}]
+            
+            # The increment is applied server-side together with the status, so concurrent slides
+            # cannot lose each other's updates and the returned count reflects this slide
+            updated_item = await self._patch_video(ppt_id, user_id, video_id, build_operations)
+            if updated_item is None:
+                return None
+            
+            logger.info(f"Marked slide {slide_index} of PPT {ppt_id}, video {video_id} as completed")
+            return PowerPointModel(**updated_item).video_information[patched_position]
+            
+        except AzureError as e:
+            logger.error(f"Error completing slide video in Cosmos DB: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error completing slide video: {e}")
+            raise
     
     async def close(self):
-        """Close the Cosmos client"""
+        """Close the Cosmos client and its credential"""
         if self.client:
-            await self.client.close()
\ No newline at end of file
+            await self.client.close()
+        if self._owns_credential:
+            await self.credential.close()
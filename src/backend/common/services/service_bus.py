@@ -1,22 +1,60 @@
-import json
 import asyncio
+import heapq
+import itertools
+import orjson # type: ignore
 from datetime import datetime, timezone
-from typing import Dict, Any, Callable, Union
+from typing import Dict, Any, Callable, Optional, Union
 import logging
 from azure.servicebus.aio import ServiceBusClient # type: ignore
 from azure.servicebus import ServiceBusMessage, ServiceBusReceivedMessage, ServiceBusReceiveMode # type: ignore
 from azure.identity.aio import DefaultAzureCredential # type: ignore
+from azure.servicebus.exceptions import ServiceBusConnectionError, MessageLockLostError, MessageAlreadySettled # type: ignore
 from azure.core.exceptions import AzureError # type: ignore
 
 logger = logging.getLogger(__name__)
 
+# A message lock is renewed once this fraction of its remaining lock time has passed,
+# leaving the rest as headroom for a slow renewal round-trip
+LOCK_RENEWAL_FRACTION = 1 / 3
+# Shortest wait before renewing a lock, in seconds
+LOCK_RENEWAL_MIN_INTERVAL = 5
+# Wait used when the lock expiry of a message is unknown, in seconds
+LOCK_RENEWAL_INTERVAL = 20
+# Time allowed for a single lock renewal request before it is given up, in seconds
+LOCK_RENEWAL_TIMEOUT = 10
+# Renewals falling due within this many seconds of the earliest one are sent in the same tick
+LOCK_RENEWAL_COALESCE_WINDOW = 5
+
 
 class ServiceBusService:
-    def __init__(self, fully_qualified_namespace: str):
-        self.credential = DefaultAzureCredential()
+    def __init__(self, fully_qualified_namespace: str, credential: Optional[DefaultAzureCredential] = None):
+        # Reuse the caller's credential (and its token cache) when given; only close credentials we created
+        self._owns_credential = credential is None
+        self.credential = credential or DefaultAzureCredential()
         self.fully_qualified_namespace = fully_qualified_namespace
         self.servicebus_client = None
         self._is_listening = False
+        # Set by stop_listening and never reset, so a stop requested before a listener starts still applies to it
+        self._stop_requested = False
+        # Set by stop_listening so waits in the listener end immediately instead of running out their timeout
+        self._stop_event = None
+        # Long-lived senders keyed by (destination_type, destination_name), so each message
+        # reuses an open AMQP link instead of negotiating a new one
+        self._senders = {}
+        # One lock per destination, so concurrent handlers never open, replace or close its sender at the same time
+        self._sender_locks = {}
+        # Messages whose locks are kept alive by the shared renewer task: token -> (receiver, message)
+        self._renewed_messages = {}
+        # Lock expiry of each tracked message on the event loop clock: token -> (deadline, lock duration),
+        # so renewals are scheduled without datetime arithmetic on locked_until_utc
+        self._lock_expiry = {}
+        # Min-heap of (next renewal time, token), so the renewer only wakes for the earliest due renewal
+        self._renew_heap = []
+        self._renew_tokens = itertools.count()
+        self._renew_event = None
+        self._renewer_task = None
+        # Renewal requests currently in progress, run in the background so one slow request does not delay the others
+        self._renew_inflight = set()
     
     async def _get_client(self):
         """Get or create the async ServiceBus client"""
@@ -27,6 +65,62 @@ class ServiceBusService:
             )
         return self.servicebus_client
     
+    def _sender_lock(self, key) -> asyncio.Lock:
+        """Get the lock guarding the cached sender of a destination"""
+        lock = self._sender_locks.get(key)
+        if lock is None:
+            lock = self._sender_locks[key] = asyncio.Lock()
+        return lock
+    
+    async def _get_sender(self, destination_type: str, destination_name: str):
+        """Get or create the cached sender for a Service Bus topic or queue"""
+        key = (destination_type, destination_name)
+        sender = self._senders.get(key)
+        if sender is not None:
+            return sender
+        async with self._sender_lock(key):
+            # Another handler may have opened the sender while we waited for the lock
+            sender = self._senders.get(key)
+            if sender is None:
+                client = await self._get_client()
+                if destination_type == "topic":
+                    sender = client.get_topic_sender(topic_name=destination_name)
+                elif destination_type == "queue":
+                    sender = client.get_queue_sender(queue_name=destination_name)
+                else:
+                    raise ValueError("Invalid destination type. Must be 'topic' or 'queue'.")
+                self._senders[key] = sender
+        return sender
+    
+    async def _discard_sender(self, destination_type: str, destination_name: str, sender=None) -> None:
+        """Close and forget a cached sender so the next send opens a new link
+        
+        When a sender is given, it is only discarded if it is still the cached one: a handler whose
+        send failed on an old link must not close the new sender another handler already opened.
+        """
+        key = (destination_type, destination_name)
+        async with self._sender_lock(key):
+            cached = self._senders.get(key)
+            if cached is None or (sender is not None and cached is not sender):
+                return
+            del self._senders[key]
+        # Closed outside the lock: handlers can already open a new sender while the old link shuts down
+        try:
+            await cached.close()
+        except Exception as e:
+            logger.warning("Error closing Service Bus sender for '%s': %s", destination_name, e)
+    
+    async def _send_with_cached_sender(self, destination_type: str, destination_name: str, method_name: str, *args) -> None:
+        """Call the given sender method on the cached sender, reopening the link once if the connection was lost"""
+        sender = await self._get_sender(destination_type, destination_name)
+        try:
+            await getattr(sender, method_name)(*args)
+        except ServiceBusConnectionError as e:
+            logger.warning("Service Bus sender for '%s' lost its connection, reopening: %s", destination_name, e)
+            await self._discard_sender(destination_type, destination_name, sender)
+            sender = await self._get_sender(destination_type, destination_name)
+            await getattr(sender, method_name)(*args)
+    
     async def send_message(self, destination_type: str, destination_name: str, message_data: Dict[str, Any]) -> None:
         """Send message to a Service Bus topic or queue
 
@@ -35,40 +129,26 @@ class ServiceBusService:
             destination_name (str): The name of the Service Bus topic or queue to send the message to.
             message_data (Dict[str, Any]): The message data to be sent, typically a dictionary containing the message content. 
         """
-        sender = None
         try:
-            # Get the async client
-            client = await self._get_client()
-            
-            if destination_type == "topic":
-                # Get the topic sender
-                sender = client.get_topic_sender(topic_name=destination_name)
-            elif destination_type == "queue":
-                # Get the queue sender
-                sender = client.get_queue_sender(queue_name=destination_name)
-            else:
-                raise ValueError("Invalid destination type. Must be 'topic' or 'queue'.")
-            
-            # Convert message data to JSON string
-            message_body = json.dumps(message_data, default=str)  # Added default=str for datetime serialization
+            # Convert message data to JSON bytes
+            message_body = orjson.dumps(message_data, default=str)  # datetimes are serialized natively, default=str covers the rest
             
             # Create ServiceBus message
             message = ServiceBusMessage(message_body)
             
-            # Send the message
-            await sender.send_messages(message)
+            # Send the message over the cached sender
+            await self._send_with_cached_sender(
+                destination_type, destination_name, "send_messages", message
+            )
             
-            logger.info(f"Message sent successfully to destination '{destination_name}' of type '{destination_type}'")
+            logger.info("Message sent successfully to destination '%s' of type '%s'", destination_name, destination_type)
             
         except AzureError as e:
-            logger.error(f"Azure error sending message to Service Bus: {e}")
+            logger.error("Azure error sending message to Service Bus: %s", e)
             raise
         except Exception as e:
-            logger.error(f"Unexpected error sending message to Service Bus: {e}")
+            logger.error("Unexpected error sending message to Service Bus: %s", e)
             raise
-        finally:
-            if sender:
-                await sender.close()
 
     async def schedule_message(self, destination_type: str, destination_name: str, message_data: Dict[str, Any], scheduled_enqueue_time: Union[datetime, float]) -> None:
         """Schedule a message to be delivered at a specific time
@@ -79,20 +159,9 @@ class ServiceBusService:
             message_data (Dict[str, Any]): The message data to be sent
             scheduled_enqueue_time (Union[datetime, float]): When to deliver the message (datetime or unix timestamp)
         """
-        sender = None
         try:
-            # Get the async client
-            client = await self._get_client()
-            
-            if destination_type == "topic":
-                sender = client.get_topic_sender(topic_name=destination_name)
-            elif destination_type == "queue":
-                sender = client.get_queue_sender(queue_name=destination_name)
-            else:
-                raise ValueError("Invalid destination type. Must be 'topic' or 'queue'.")
-            
-            # Convert message data to JSON string
-            message_body = json.dumps(message_data, default=str)
+            # Convert message data to JSON bytes
+            message_body = orjson.dumps(message_data, default=str)
             
             # Create ServiceBus message
             message = ServiceBusMessage(message_body)
@@ -103,20 +172,19 @@ class ServiceBusService:
             else:
                 scheduled_time = scheduled_enqueue_time
             
-            # Schedule the message
-            await sender.schedule_messages(message, scheduled_time)
+            # Schedule the message over the cached sender
+            await self._send_with_cached_sender(
+                destination_type, destination_name, "schedule_messages", message, scheduled_time
+            )
             
-            logger.info(f"Message scheduled successfully to destination '{destination_name}' for {scheduled_time}")
+            logger.info("Message scheduled successfully to destination '%s' for %s", destination_name, scheduled_time)
             
         except AzureError as e:
-            logger.error(f"Azure error scheduling message to Service Bus: {e}")
+            logger.error("Azure error scheduling message to Service Bus: %s", e)
             raise
         except Exception as e:
-            logger.error(f"Unexpected error scheduling message to Service Bus: {e}")
+            logger.error("Unexpected error scheduling message to Service Bus: %s", e)
             raise
-        finally:
-            if sender:
-                await sender.close()
 
     async def _listen_to_messages(
         self,
@@ -133,70 +201,129 @@ class ServiceBusService:
             receiver_factory: Function that creates and returns a receiver
             receiver_name: Name for logging purposes (e.g., "queue 'myqueue'" or "topic 'mytopic', subscription 'mysub'")
             message_handler: Async function to handle received messages
-            max_message_count: Maximum number of messages to receive at once
+            max_message_count: Maximum number of messages to receive and process concurrently
             retry_delay: Delay between retries when errors occur (seconds)
         """
+        if self._stop_requested:
+            logger.info("Listening was stopped before the listener for %s started", receiver_name)
+            return
         self._is_listening = True
+        self._stop_event = asyncio.Event()
+        # Completes when stop_listening is called; waited on alongside in-flight messages and retry delays
+        stop_requested = asyncio.create_task(self._stop_event.wait())
         receiver = None
+        # Messages currently being processed; at most max_message_count at a time
+        in_flight = set()
         
         try:
             receiver = receiver_factory()
-            logger.info(f"Starting to listen for messages on {receiver_name}")
+            logger.info("Starting to listen for messages on %s", receiver_name)
             
             async with receiver:
                 while self._is_listening:
                     try:
-                        # Receive messages in batches
+                        if len(in_flight) >= max_message_count:
+                            # All processing slots are busy, wait for one to free up (or a stop) before receiving more
+                            await asyncio.wait(in_flight | {stop_requested}, return_when=asyncio.FIRST_COMPLETED)
+                            continue
+                        
+                        # Receive as many messages as there are free processing slots
                         received_msgs = await receiver.receive_messages(
-                            max_message_count=max_message_count,
+                            max_message_count=max_message_count - len(in_flight),
                             max_wait_time=5
                         )
                         
+                        # Process each message in its own task so a slow message does not hold up the others
                         for msg in received_msgs:
-                            try:
-                                if use_lock_renewer:
-                                    # Run message processing and lock renewal concurrently
-                                    lock_renewal_task = asyncio.create_task(
-                                        self._renew_message_lock_periodically(receiver, msg)
-                                    )
-                                    
-                                    # Create message handler task
-                                    handler_task = asyncio.create_task(message_handler(msg))
-                                    
-                                    try:
-                                        # Wait for message handler to complete
-                                        await handler_task
-                                        logger.info("Message processed successfully")
-                                    finally:
-                                        # Always cancel lock renewal when message processing is done
-                                        lock_renewal_task.cancel()
-                                        try:
-                                            await lock_renewal_task
-                                        except asyncio.CancelledError:
-                                            pass  # Expected when we cancel the task
-                                else:
-                                    # No lock renewal needed, just process the message
-                                    await message_handler(msg)
-                                    logger.info("Message processed successfully")
-
-                                await receiver.complete_message(msg)
-                                
-                            except Exception as e:
-                                logger.error(f"Error processing message: {str(e)}")
-                                await receiver.abandon_message(msg)
+                            task = asyncio.create_task(
+                                self._process_message(receiver, msg, message_handler, use_lock_renewer)
+                            )
+                            in_flight.add(task)
+                            task.add_done_callback(in_flight.discard)
                                 
                     except Exception as e:
                         if self._is_listening:  # Only log if we're still supposed to be listening
-                            logger.error(f"Error receiving messages: {str(e)}")
-                            await asyncio.sleep(retry_delay)  # Wait before retrying
+                            logger.error("Error receiving messages: %s", e)
+                            await asyncio.wait({stop_requested}, timeout=retry_delay)  # Wait before retrying, unless stopped
+                
+                # Let messages that are already being processed finish and settle before closing the receiver
+                if in_flight:
+                    await asyncio.gather(*in_flight, return_exceptions=True)
                             
         except Exception as e:
-            logger.error(f"Fatal error in message processing for {receiver_name}: {str(e)}")
+            logger.error("Fatal error in message processing for %s: %s", receiver_name, e)
             raise
         finally:
+            # Only left over if listening ended abnormally (e.g. cancellation). Wait for the cancelled
+            # handlers to abandon their messages while the receiver is still open, so none of them
+            # outlives the listener, its receiver or the lock renewer.
+            for task in in_flight:
+                task.cancel()
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+            stop_requested.cancel()
+            await self._stop_lock_renewer()
             if receiver:
                 await receiver.close()
-            logger.info(f"Stopped listening for messages on {receiver_name}")
+            logger.info("Stopped listening for messages on %s", receiver_name)
+    
+    async def _process_message(
+        self,
+        receiver,
+        msg: ServiceBusReceivedMessage,
+        message_handler: Callable[[ServiceBusReceivedMessage], Any],
+        use_lock_renewer: bool
+    ) -> None:
+        """Run the handler for a single message and settle it as soon as the handler finishes
+        
+        Each message runs in its own task, so settlements go out concurrently without holding
+        finished messages until a slower one is done (their locks are no longer renewed once
+        the handler returns). Lock renewal is done by one shared renewer task for all messages.
+        
+        Args:
+            receiver: The receiver the message was received from
+            msg: The message to process
+            message_handler: Async function to handle the message
+            use_lock_renewer: Whether to renew the message lock while the handler runs
+        """
+        # Keep the lock alive through the shared renewer while the handler runs
+        renew_token = self._track_message(receiver, msg) if use_lock_renewer else None
+        try:
+            await message_handler(msg)
+            logger.info("Message processed successfully")
+            succeeded = True
+            
+        except asyncio.CancelledError:
+            # The listener is shutting down abnormally: hand the message back to the broker right away
+            # so it is redelivered now instead of once its lock expires
+            logger.warning("Message processing cancelled, abandoning message")
+            if renew_token is not None:
+                self._untrack_message(renew_token)
+            await self._settle_message(receiver, msg, False)
+            raise
+        except Exception as e:
+            logger.error("Error processing message: %s", e)
+            succeeded = False
+        finally:
+            # Stop renewing as soon as processing is done
+            if renew_token is not None:
+                self._untrack_message(renew_token)
+        
+        await self._settle_message(receiver, msg, succeeded)
+    
+    async def _settle_message(self, receiver, msg: ServiceBusReceivedMessage, succeeded: bool) -> None:
+        """Complete or abandon a processed message
+        
+        Settlement errors are logged rather than raised since nothing awaits the processing task's
+        result; the broker redelivers the message once its lock expires.
+        """
+        try:
+            if succeeded:
+                await receiver.complete_message(msg)
+            else:
+                await receiver.abandon_message(msg)
+        except Exception as e:
+            logger.error("Failed to %s message: %s", 'complete' if succeeded else 'abandon', e)
     
     async def listen_to_subscription(
         self,
@@ -207,7 +334,8 @@ class ServiceBusService:
         max_message_count: int = 1,
         retry_delay: int = 5,
         use_lock_renewer: bool = False,
-        use_delete_receiver: bool = False
+        use_delete_receiver: bool = False,
+        prefetch_count: int = 0
     ) -> None:
         """Listen to messages from a Service Bus subscription
         
@@ -220,6 +348,7 @@ class ServiceBusService:
             retry_delay: Delay between retries when errors occur (seconds)
             use_lock_renewer: Whether to use message lock renewal
             use_delete_receiver: Whether to use RECEIVE_AND_DELETE mode
+            prefetch_count: Number of messages to buffer locally ahead of processing
         """
         client = await self._get_client()
         receive_mode = ServiceBusReceiveMode.RECEIVE_AND_DELETE if use_delete_receiver else ServiceBusReceiveMode.PEEK_LOCK
@@ -229,7 +358,8 @@ class ServiceBusService:
                 topic_name=topic_name,
                 receive_mode=receive_mode,
                 subscription_name=subscription_name,
-                max_wait_time=max_wait_time
+                max_wait_time=max_wait_time,
+                prefetch_count=prefetch_count
             )
         
         receiver_name = f"topic '{topic_name}', subscription '{subscription_name}'"
@@ -243,7 +373,8 @@ class ServiceBusService:
         max_message_count: int = 1,
         retry_delay: int = 5,
         use_lock_renewer: bool = False,
-        use_delete_receiver: bool = False
+        use_delete_receiver: bool = False,
+        prefetch_count: int = 0
     ) -> None:
         """Listen to messages from a Service Bus queue
         
@@ -255,6 +386,7 @@ class ServiceBusService:
             retry_delay: Delay between retries when errors occur (seconds)
             use_lock_renewer: Whether to use message lock renewal
             use_delete_receiver: Whether to use RECEIVE_AND_DELETE mode
+            prefetch_count: Number of messages to buffer locally ahead of processing
         """
         client = await self._get_client()
         receive_mode = ServiceBusReceiveMode.RECEIVE_AND_DELETE if use_delete_receiver else ServiceBusReceiveMode.PEEK_LOCK
@@ -263,42 +395,187 @@ class ServiceBusService:
             return client.get_queue_receiver(
                 queue_name=queue_name,
                 receive_mode=receive_mode,
-                max_wait_time=max_wait_time
+                max_wait_time=max_wait_time,
+                prefetch_count=prefetch_count
             )
         
         receiver_name = f"queue '{queue_name}'"
         await self._listen_to_messages(create_receiver, receiver_name, message_handler, max_message_count, retry_delay, use_lock_renewer)
 
-    async def _renew_message_lock_periodically(self, receiver, message):
-        """Periodically renew message lock during long processing"""
+    def _track_message(self, receiver, message: ServiceBusReceivedMessage) -> int:
+        """Start renewing the lock of a message, starting the shared renewer task if needed
+
+        Returns:
+            int: The token to pass to _untrack_message once the message has been processed
+        """
+        if self._renewer_task is None or self._renewer_task.done():
+            self._renew_event = asyncio.Event()
+            self._renewer_task = asyncio.create_task(self._renew_message_locks())
+        
+        token = next(self._renew_tokens)
+        self._renewed_messages[token] = (receiver, message)
+        remaining = self._lock_remaining(message)
+        deadline = None if remaining is None else asyncio.get_running_loop().time() + remaining
+        # The lock duration is only known after the first renewal, as the message may have waited in the prefetch buffer
+        self._lock_expiry[token] = (deadline, None)
+        self._schedule_lock_renewal(token)
+        return token
+
+    @staticmethod
+    def _lock_remaining(message: ServiceBusReceivedMessage) -> Optional[float]:
+        """Seconds until the lock of a message expires, or None if the message does not report it"""
+        locked_until = message.locked_until_utc
+        if locked_until is None:
+            return None
+        if locked_until.tzinfo is None:
+            locked_until = locked_until.replace(tzinfo=timezone.utc)
+        return (locked_until - datetime.now(timezone.utc)).total_seconds()
+
+    def _schedule_lock_renewal(self, token: int) -> None:
+        """Schedule the next renewal of a message lock relative to when the lock actually expires"""
+        now = asyncio.get_running_loop().time()
+        deadline, _ = self._lock_expiry[token]
+        delay = LOCK_RENEWAL_INTERVAL
+        if deadline is not None:
+            delay = max(LOCK_RENEWAL_MIN_INTERVAL, (deadline - now) * LOCK_RENEWAL_FRACTION)
+        heapq.heappush(self._renew_heap, (now + delay, token))
+        # Wake the renewer in case it is idle or waiting for a later deadline
+        self._renew_event.set()
+
+    def _record_lock_renewal(self, message: ServiceBusReceivedMessage, token: int, sent_at: float) -> None:
+        """Move the lock deadline of a message forward after a successful renewal"""
+        _, lock_duration = self._lock_expiry[token]
+        if lock_duration is None:
+            # Read locked_until_utc once to learn the lock duration, later renewals reuse it
+            lock_duration = self._lock_remaining(message)
+            if lock_duration is None:
+                return
+        # The broker renewed the lock after the request was sent, so this deadline errs on the early side
+        self._lock_expiry[token] = (sent_at + lock_duration, lock_duration)
+
+    def _untrack_message(self, token: int) -> None:
+        """Stop renewing the lock of a message; its heap entry is dropped when it comes due"""
+        self._renewed_messages.pop(token, None)
+        self._lock_expiry.pop(token, None)
+
+    async def _renew_message_locks(self):
+        """Shared task renewing the locks of all tracked messages, waking only when the earliest renewal is due"""
+        loop = asyncio.get_running_loop()
         try:
             while True:
-                try:
-                    await receiver.renew_message_lock(message)
-                    logger.info(f"Message lock renewed successfully")
-                except Exception as e:
-                    error_message = str(e).lower()
-                    # Stop trying to renew if message has been settled or deleted
-                    if "deleted" in error_message or "settled" in error_message or "expired" in error_message:
-                        logger.info(f"Message has been settled, deleted or expired, stopping lock renewal: {e}")
-                        break
-                    else:
-                        logger.warning(f"Failed to renew message lock: {e}")
-                        # Continue trying for other types of errors
-                finally:
-                    # Wait before renewing again
-                    await asyncio.sleep(20)
+                # Discard entries of messages that are no longer being processed
+                while self._renew_heap and self._renew_heap[0][1] not in self._renewed_messages:
+                    heapq.heappop(self._renew_heap)
+                
+                # Cleared before looking at the heap, so a message tracked from now on wakes us up
+                self._renew_event.clear()
+                if not self._renew_heap:
+                    await self._renew_event.wait()
+                    continue
+                
+                next_due = self._renew_heap[0][0]
+                if next_due > loop.time():
+                    # A timer sets the event at the deadline, so the usual timed wake-up needs no
+                    # wait_for wrapper task and raises no TimeoutError
+                    wake_handle = loop.call_at(next_due, self._renew_event.set)
+                    try:
+                        await self._renew_event.wait()
+                    finally:
+                        wake_handle.cancel()
+                    continue
+                
+                # Take every renewal due within the coalescing window, renewing those slightly early
+                # so the renewer wakes once per group of messages instead of once per message
+                coalesce_until = loop.time() + LOCK_RENEWAL_COALESCE_WINDOW
+                due = []
+                while self._renew_heap and self._renew_heap[0][0] <= coalesce_until:
+                    _, token = heapq.heappop(self._renew_heap)
+                    if token in self._renewed_messages:
+                        receiver, message = self._renewed_messages[token]
+                        due.append(self._renew_message_lock(receiver, message, token))
+                
+                # All due renewals go out concurrently, and are not awaited: the next due renewal
+                # must not wait for these requests to come back
+                renew_task = asyncio.gather(*due, return_exceptions=True)
+                self._renew_inflight.add(renew_task)
+                renew_task.add_done_callback(self._on_renewals_done)
         except asyncio.CancelledError:
             logger.info("Lock renewal task cancelled")
-            pass
+            raise
+
+    def _on_renewals_done(self, renew_task: asyncio.Future) -> None:
+        """Forget a finished group of renewal requests and report unexpected failures"""
+        self._renew_inflight.discard(renew_task)
+        if renew_task.cancelled():
+            return
+        for result in renew_task.result():
+            # Expected renewal errors are handled per message; anything else would otherwise go unnoticed
+            if isinstance(result, BaseException):
+                logger.error("Unexpected error in lock renewal: %r", result)
+
+    async def _renew_message_lock(self, receiver, message: ServiceBusReceivedMessage, token: int) -> None:
+        """Renew the lock of a tracked message and schedule its next renewal
+
+        The next renewal is only scheduled once this one has finished, so a message never has two
+        renewals in flight; the timeout bounds how long a stuck request can hold it back.
+        """
+        sent_at = asyncio.get_running_loop().time()
+        try:
+            await asyncio.wait_for(receiver.renew_message_lock(message), timeout=LOCK_RENEWAL_TIMEOUT)
+            if token in self._renewed_messages:
+                self._record_lock_renewal(message, token, sent_at)
+            logger.info("Message lock renewed successfully")
+        except (MessageLockLostError, MessageAlreadySettled) as e:
+            # The lock cannot be renewed anymore, further attempts would only fail the same way
+            logger.info("Message lock was lost or the message settled, stopping lock renewal: %s", e)
+            self._untrack_message(token)
+            return
+        except (asyncio.TimeoutError, ServiceBusConnectionError) as e:
+            # Transient: retried at the next renewal, which comes sooner as the lock runs down
+            logger.warning("Transient failure renewing message lock, retrying: %r", e)
+        except Exception as e:
+            error_message = str(e).lower()
+            # Stop trying to renew if message has been settled or deleted
+            if "deleted" in error_message or "settled" in error_message or "expired" in error_message:
+                logger.info("Message has been settled, deleted or expired, stopping lock renewal: %s", e)
+                self._untrack_message(token)
+                return
+            else:
+                logger.warning("Failed to renew message lock: %s", e)
+                # Continue trying for other types of errors
+        
+        if token in self._renewed_messages:
+            self._schedule_lock_renewal(token)
+
+    async def _stop_lock_renewer(self) -> None:
+        """Cancel the shared renewer task and its renewal requests, and forget all tracked messages"""
+        self._renewed_messages.clear()
+        self._lock_expiry.clear()
+        self._renew_heap.clear()
+        for renew_task in list(self._renew_inflight):
+            renew_task.cancel()
+        if self._renewer_task is not None:
+            self._renewer_task.cancel()
+            # asyncio.wait does not re-raise the renewer's cancellation, but still lets a
+            # cancellation of the caller itself propagate instead of swallowing it
+            await asyncio.wait({self._renewer_task})
+            self._renewer_task = None
 
     def stop_listening(self):
-        """Stop listening for messages"""
+        """Stop listening for messages, including listeners that have not started yet"""
+        self._stop_requested = True
         self._is_listening = False
+        if self._stop_event is not None:
+            self._stop_event.set()
         logger.info("Stopping message listener...")
     
     async def close(self):
-        """Close the ServiceBus client"""
+        """Close the cached senders, the ServiceBus client and its credential"""
         self.stop_listening()
+        await self._stop_lock_renewer()
+        for destination_type, destination_name in list(self._senders):
+            await self._discard_sender(destination_type, destination_name)
         if self.servicebus_client:
-            await self.servicebus_client.close()
\ No newline at end of file
+            await self.servicebus_client.close()
+        if self._owns_credential:
+            await self.credential.close()
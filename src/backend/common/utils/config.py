@@ -24,6 +24,9 @@ class Settings(BaseSettings):
     speech_endpoint: str
     speech_api_version: str = "2024-04-15-preview"
     
+    # Video transformation: process pool size and concurrent slides, matching the container's vCPU limit
+    video_transformation_workers: int = 2
+    
     # API Settings
     api_host: str = "0.0.0.0"
     api_port: int = 8000
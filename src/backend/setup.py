@@ -13,11 +13,12 @@ setup(
         "azure-identity==1.21.0",
         "azure-core==1.34.0",
         "python-dotenv==1.1.0",
-        "aiofiles==24.1.0",
         "aiohttp ==3.11.18",
+        "orjson==3.10.18",
+        "uvloop==0.21.0; sys_platform != 'win32'",
         "pdf2image==1.17.0",
         "Pillow==11.2.1",
         "python-pptx==1.0.2"
     ],
-    python_requires=">=3.8",
+    python_requires=">=3.9",
 )
\ No newline at end of file
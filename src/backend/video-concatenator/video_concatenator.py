@@ -1,10 +1,10 @@
 import tempfile
 import os
+import re
 import asyncio
 import shutil
-import aiofiles
+from pathlib import Path
 from typing import Dict, Any, List
-from azure.identity.aio import DefaultAzureCredential # type: ignore
 
 from common.services.base_service import BaseService
 from common.services.cosmos_db import CosmosDBService
@@ -14,6 +14,17 @@ from common.models.messages import VideoConcatenationMessage
 from common.models.service_config import ServiceBusConfig
 from common.utils.config import Settings
 
+# Numbered slide videos ({index}.mp4); anything else (e.g. final.mp4) is skipped
+_SLIDE_RE = re.compile(r'^(\d+)\.mp4$')
+
+# Query string of a URL, which carries the SAS token of the blob URLs ffmpeg echoes in its errors
+_URL_QUERY_RE = re.compile(r'(https?://[^\s?\'"]+)\?[^\s\'":]*')
+
+
+def _redact_url_queries(text: str) -> str:
+    """Strip query strings from the URLs in a message so SAS tokens never reach the logs"""
+    return _URL_QUERY_RE.sub(r'\1?<redacted>', text)
+
 
 class VideoConcatenator(BaseService):
     """
@@ -46,11 +57,11 @@ class VideoConcatenator(BaseService):
     
     async def _initialize(self):
         """Initialize video concatenation specific resources including Azure services."""
-        self.credential = DefaultAzureCredential()
-        self.blob_storage = BlobStorageService(self.settings.storage_account_url)
+        self.blob_storage = BlobStorageService(self.settings.storage_account_url, credential=self.credential)
         self.cosmos_db = CosmosDBService(
             self.settings.cosmos_db_endpoint,
             self.settings.cosmos_db_database_name,
+            credential=self.credential,
         )
     
     async def handle_message(self, message_data: Dict[str, Any]) -> None:
@@ -132,8 +143,9 @@ class VideoConcatenator(BaseService):
         
         This method:
         1. Lists all numbered video files from blob storage
-        2. Downloads them to a temporary directory
-        3. Creates an FFmpeg concat file list
+        2. Creates an FFmpeg concat file list of read-only SAS URLs so FFmpeg streams
+           the videos straight from blob storage
+        3. Falls back to downloading them to a temporary directory if streaming fails
         4. Runs FFmpeg to concatenate videos
         5. Uploads the final video back to blob storage
         6. Cleans up temporary files
@@ -164,16 +176,28 @@ class VideoConcatenator(BaseService):
             
             self.logger.info(f"Found {len(video_files)} video files to concatenate")
             
-            # Download all video files for concatenation
-            downloaded_files = await self._download_video_files(video_files, temp_dir)
-            
-            # Create ffmpeg concat file list for video concatenation
             concat_file_path = os.path.join(temp_dir, "concat_list.txt")
-            await self._create_concat_file(downloaded_files, concat_file_path)
-            
-            # Concatenate videos using ffmpeg
             output_file_path = os.path.join(temp_dir, "final.mp4")
-            await self._run_ffmpeg_concat(concat_file_path, output_file_path)
+            
+            try:
+                # Let ffmpeg read the videos directly from blob storage through SAS URLs
+                sas_urls = await self.blob_storage.get_blob_urls_with_sas(
+                    self.settings.blob_container_name,
+                    video_files
+                )
+                await self._create_concat_file(sas_urls, concat_file_path)
+                await self._run_ffmpeg_concat(concat_file_path, output_file_path)
+            except Exception as stream_error:
+                self.logger.warning(f"Streaming concatenation from blob storage failed, falling back to local download: {_redact_url_queries(str(stream_error))}")
+                
+                # Download all video files for concatenation
+                downloaded_files = await self._download_video_files(video_files, temp_dir)
+                
+                # Create ffmpeg concat file list for video concatenation
+                await self._create_concat_file(downloaded_files, concat_file_path)
+                
+                # Concatenate videos using ffmpeg
+                await self._run_ffmpeg_concat(concat_file_path, output_file_path)
             
             # Upload the concatenated video back to blob storage
             final_blob_name = f"{ppt_id}/videos/{video_id}/final.mp4"
@@ -217,18 +241,12 @@ class VideoConcatenator(BaseService):
             video_files = []
             
             async for blob in container_client.list_blobs(name_starts_with=prefix):
-                blob_name = blob.name
                 # Only include numbered mp4 files for concatenation (0.mp4, 1.mp4, etc.), exclude final.mp4
-                filename = os.path.basename(blob_name)
-                if filename.endswith('.mp4') and filename != 'final.mp4':
-                    try:
-                        # Extract the number from filename for concatenation order (e.g., "0.mp4" -> 0)
-                        file_number = int(filename.split('.')[0])
-                        video_files.append((file_number, blob_name))
-                    except ValueError:
-                        # Skip files that don't match the expected naming pattern for concatenation
-                        self.logger.warning(f"Skipping file with unexpected name pattern for concatenation: {filename}")
-                        continue
+                match = _SLIDE_RE.match(os.path.basename(blob.name))
+                if not match:
+                    continue
+                # Extract the number from filename for concatenation order (e.g., "0.mp4" -> 0)
+                video_files.append((int(match.group(1)), blob.name))
             
             # Sort by file number to ensure correct concatenation order
             video_files.sort(key=lambda x: x[0])
@@ -261,17 +279,14 @@ class VideoConcatenator(BaseService):
         
         for i, blob_name in enumerate(video_files):
             try:
-                # Download file data from blob storage for concatenation
-                file_data = await self.blob_storage.download_file(
+                # Stream the blob straight into a temporary file with sequential naming for concatenation
+                temp_file_path = os.path.join(temp_dir, f"video_{i:03d}.mp4")
+                await self.blob_storage.download_to_file(
                     self.settings.blob_container_name, 
-                    blob_name
+                    blob_name,
+                    temp_file_path
                 )
                 
-                # Save to temporary file with sequential naming for concatenation
-                temp_file_path = os.path.join(temp_dir, f"video_{i:03d}.mp4")
-                async with aiofiles.open(temp_file_path, 'wb') as f:
-                    await f.write(file_data)
-                
                 downloaded_files.append(temp_file_path)
                 self.logger.info(f"Downloaded video file for concatenation: {blob_name} -> {temp_file_path}")
                 
@@ -289,18 +304,21 @@ class VideoConcatenator(BaseService):
         FFmpeg's concat demuxer for video concatenation: "file 'path/to/video.mp4'"
         
         Args:
-            video_files: List of local video file paths for concatenation
+            video_files: List of local video file paths or HTTPS URLs for concatenation
             concat_file_path: Path where to save the concatenation file list
             
         Raises:
             Exception: If concatenation file creation fails
         """
         try:
-            async with aiofiles.open(concat_file_path, 'w') as f:
-                for video_file in video_files:
-                    # Escape single quotes in file paths for ffmpeg concatenation
-                    escaped_path = video_file.replace("'", "'\\''")
-                    await f.write(f"file '{escaped_path}'\n")
+            lines = []
+            for video_file in video_files:
+                # Escape single quotes in file paths for ffmpeg concatenation
+                escaped_path = video_file.replace("'", "'\\''")
+                lines.append(f"file '{escaped_path}'\n")
+            
+            # Write the whole list with a single thread hop
+            await asyncio.to_thread(Path(concat_file_path).write_text, ''.join(lines))
             
             self.logger.info(f"Created concatenation file: {concat_file_path} with {len(video_files)} entries")
             
@@ -326,6 +344,7 @@ class VideoConcatenator(BaseService):
             # FFmpeg command to concatenate videos using concat demuxer
             cmd = [
                 'ffmpeg',
+                '-protocol_whitelist', 'file,http,https,tcp,tls,crypto',  # Allow concat entries to be SAS URLs
                 '-f', 'concat',           # Use concat demuxer for video concatenation
                 '-safe', '0',             # Allow unsafe file paths in concatenation
                 '-i', concat_file_path,   # Input concatenation file
@@ -346,7 +365,8 @@ class VideoConcatenator(BaseService):
             stdout, stderr = await process.communicate()
             
             if process.returncode != 0:
-                error_msg = stderr.decode() if stderr else "Unknown ffmpeg concatenation error"
+                # ffmpeg echoes its inputs, which may be SAS URLs
+                error_msg = _redact_url_queries(stderr.decode()) if stderr else "Unknown ffmpeg concatenation error"
                 raise RuntimeError(f"FFmpeg concatenation failed with return code {process.returncode}: {error_msg}")
             
             self.logger.info("FFmpeg video concatenation completed successfully")
@@ -369,8 +389,8 @@ class VideoConcatenator(BaseService):
         """
         Upload the concatenated video back to blob storage.
         
-        Reads the local concatenated video file and uploads it to the specified
-        blob location in Azure Blob Storage.
+        Streams the local concatenated video file to the specified blob location
+        in Azure Blob Storage without loading it into memory.
         
         Args:
             local_file_path: Local path to the concatenated video file
@@ -383,18 +403,14 @@ class VideoConcatenator(BaseService):
             Exception: If concatenated file reading or upload fails
         """
         try:
-            # Read the concatenated video file
-            async with aiofiles.open(local_file_path, 'rb') as f:
-                file_data = await f.read()
-            
             # Upload concatenated video to blob storage
-            output_url = await self.blob_storage.upload_file(
+            output_url = await self.blob_storage.upload_from_file(
                 self.settings.blob_container_name,
                 blob_name,
-                file_data
+                local_file_path
             )
             
-            self.logger.info(f"Uploaded concatenated video: {blob_name} ({len(file_data)} bytes)")
+            self.logger.info(f"Uploaded concatenated video: {blob_name} ({os.path.getsize(local_file_path)} bytes)")
             return output_url
             
         except Exception as e:
@@ -422,7 +438,7 @@ class VideoConcatenator(BaseService):
         """
         Cleanup video concatenation specific resources.
         
-        Closes connections to Azure services (Cosmos DB and Azure credentials)
+        Closes connections to Azure services (Cosmos DB and Blob Storage)
         when the video concatenation service is shutting down.
         """
         try:
@@ -430,7 +446,5 @@ class VideoConcatenator(BaseService):
                 await self.cosmos_db.close()
             if hasattr(self, 'blob_storage'):
                 await self.blob_storage.close()
-            if hasattr(self, 'credential'):
-                await self.credential.close()
         except Exception as e:
             self.logger.error(f"Error during video concatenation cleanup: {str(e)}")
\ No newline at end of file
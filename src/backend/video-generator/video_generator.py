@@ -1,13 +1,14 @@
 import asyncio
+import hashlib
 import uuid
 import time
 import random
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import aiohttp # type: ignore
-from azure.identity.aio import DefaultAzureCredential # type: ignore
+import orjson # type: ignore
 from azure.servicebus import ServiceBusReceivedMessage # type: ignore
 
-from common.services.base_service import BaseService
+from common.services.base_service import BaseService, SERVICE_BUS_TOKEN_SCOPE
 from common.services.cosmos_db import CosmosDBService
 from common.models.powerpoint import StatusEnum
 from common.models.messages import VideoGenerationMessage, VideoTransformationMessage
@@ -20,6 +21,8 @@ class VideoGeneratorService(BaseService):
     
     def __init__(self, settings: Settings):
         config = ServiceBusConfig.for_queue(settings.service_bus_video_generation_queue_name)
+        # Synthesis jobs are almost entirely waiting on the Speech API, so handle several at once
+        config.max_message_count = 8
         super().__init__(settings, "Video Generator Service", config)
         
         # Rate limiting and retry configuration
@@ -28,10 +31,21 @@ class VideoGeneratorService(BaseService):
         self.max_delay = 300.0
         self.jitter_range = 0.1
         
+        # Synthesis status polling: exponential backoff from the initial interval up to the maximum
+        self.poll_initial_interval = 2.0
+        self.poll_max_interval = 30.0
+        self.poll_backoff_factor = 1.5
+        self.poll_jitter_range = 0.5  # Up to this fraction of the interval is added as random jitter
+        
         # Message retry configuration
         self.max_message_retries = 3  # Maximum number of times to retry a failed message
         self.retry_delay_seconds = 10 # 10 seconds delay before retry
         
+        # Results of successful syntheses keyed by script/avatar/voice, so repeated slides skip the Speech API
+        self._synthesis_cache: Dict[str, Tuple[str, float]] = {}
+        self.synthesis_cache_ttl = 3600  # Seconds a cached download URL is reused
+        self.synthesis_cache_max_entries = 1024
+        
         # Avatar configuration mapping
         self.avatar_mapping = {
             "default": {
@@ -80,12 +94,22 @@ class VideoGeneratorService(BaseService):
     
     async def _initialize(self):
         """Initialize video generator specific resources"""
-        self.credential = DefaultAzureCredential()
+        # Headers of the synthesis job submission, built once instead of on every attempt
+        self._static_headers = {'Content-Type': 'application/json'}
+        # Shared HTTP session so Speech API calls reuse pooled keep-alive connections
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=60)
+        )
         self.cosmos_db = CosmosDBService(
             self.settings.cosmos_db_endpoint,
             self.settings.cosmos_db_database_name,
+            credential=self.credential,
         )
     
+    def _token_scopes(self) -> List[str]:
+        """Only Service Bus and Cosmos DB: the video generator has no blob client"""
+        return [SERVICE_BUS_TOKEN_SCOPE, self._cosmos_token_scope()]
+    
     async def handle_message(self, message_data: Dict[str, Any]) -> None:
         """Handle video generation message with retry logic"""
         # Create VideoGenerationMessage object
@@ -104,9 +128,6 @@ class VideoGeneratorService(BaseService):
                 self.logger.info(f"Skipping video generation for PPT {video_message.ppt_id}, slide {video_message.index} - ShowAvatar is False")
                 return
             
-            # Generate unique job ID for Azure Speech API
-            azure_job_id = str(uuid.uuid4())
-            
             # Create avatar configuration dictionary
             avatar_config = {
                 'avatar_persona': video_message.avatar_persona,
@@ -115,27 +136,40 @@ class VideoGeneratorService(BaseService):
                 'language': video_message.language
             }
             
-            # Submit synthesis job with retry logic
-            success = await self.submit_synthesis_job(azure_job_id, video_message.script, avatar_config)
+            # Reuse the result of an identical synthesis (same script, avatar and voice) if we have one
+            cache_key = self._synthesis_cache_key(video_message.script, avatar_config)
+            download_url = self._get_cached_synthesis(cache_key)
             
-            if not success:
-                self.logger.error(f"Failed to submit synthesis job for PPT {video_message.ppt_id}, slide {video_message.index}")
-                await self._handle_processing_failure(message_data, retry_count, "Failed to submit synthesis job")
-                return
+            if download_url:
+                self.logger.info(f"Reusing synthesized video for PPT {video_message.ppt_id}, slide {video_message.index}")
+            else:
+                # Generate unique job ID for Azure Speech API
+                azure_job_id = str(uuid.uuid4())
+                
+                # Submit synthesis job with retry logic
+                success = await self.submit_synthesis_job(azure_job_id, video_message.script, avatar_config)
+                
+                if not success:
+                    self.logger.error(f"Failed to submit synthesis job for PPT {video_message.ppt_id}, slide {video_message.index}")
+                    await self._handle_processing_failure(message_data, retry_count, "Failed to submit synthesis job")
+                    return
+                
+                # Wait for completion
+                status, download_url = await self.wait_for_completion(azure_job_id)
+                
+                if status != 'Succeeded' or not download_url:
+                    error_msg = f"Video generation failed with status: {status}"
+                    self.logger.error(f"Failed to generate video for PPT {video_message.ppt_id}, slide {video_message.index}, status: {status}")
+                    await self._handle_processing_failure(message_data, retry_count, error_msg)
+                    return
+                
+                self._cache_synthesis(cache_key, download_url)
             
-            # Wait for completion
-            status, download_url = await self.wait_for_completion(azure_job_id)
+            self.logger.info(f"Video generated successfully for PPT {video_message.ppt_id}, slide {video_message.index}: {download_url}")
+            await self._update_status(video_message, StatusEnum.COMPLETED, 'generation_status')
             
-            if status == 'Succeeded' and download_url:
-                self.logger.info(f"Video generated successfully for PPT {video_message.ppt_id}, slide {video_message.index}: {download_url}")
-                await self._update_status(video_message, StatusEnum.COMPLETED, 'generation_status')
-                
-                # Send message to transformation queue
-                await self.send_transformation_message(video_message, download_url)
-            else:
-                error_msg = f"Video generation failed with status: {status}"
-                self.logger.error(f"Failed to generate video for PPT {video_message.ppt_id}, slide {video_message.index}, status: {status}")
-                await self._handle_processing_failure(message_data, retry_count, error_msg)
+            # Send message to transformation queue
+            await self.send_transformation_message(video_message, download_url)
                 
         except Exception as e:
             error_msg = f"Unexpected error during video generation: {str(e)}"
@@ -211,25 +245,16 @@ class VideoGeneratorService(BaseService):
     
     async def _update_status(self, video_message: VideoGenerationMessage, status: StatusEnum, status_type: str = 'both'):
         """Update video generation status in Cosmos DB"""
-        if status_type in ['generation_status', 'both']:
-            await self.cosmos_db.update_slide_video_status(
-                ppt_id=video_message.ppt_id,
-                user_id=video_message.user_id,
-                video_id=video_message.video_id,
-                slide_index=video_message.index,
-                status_type='generation_status',
-                new_status=status,
-            )
-        
-        if status_type in ['status', 'both']:
-            await self.cosmos_db.update_slide_video_status(
-                ppt_id=video_message.ppt_id,
-                user_id=video_message.user_id,
-                video_id=video_message.video_id,
-                slide_index=video_message.index,
-                status_type='status',
-                new_status=status,
-            )
+        status_types = ['generation_status', 'status'] if status_type == 'both' else [status_type]
+        # Both statuses are written in a single patch
+        await self.cosmos_db.update_slide_video_status(
+            ppt_id=video_message.ppt_id,
+            user_id=video_message.user_id,
+            video_id=video_message.video_id,
+            slide_index=video_message.index,
+            status_type=status_types,
+            new_status=status,
+        )
     
     def _calculate_retry_delay(self, attempt: int, retry_after: Optional[int] = None) -> float:
         """Calculate delay for retry with exponential backoff and jitter"""
@@ -273,6 +298,31 @@ class VideoGeneratorService(BaseService):
         mapped_config = self.avatar_mapping.get(avatar_persona, self.avatar_mapping['default'])
         return mapped_config
     
+    def _synthesis_cache_key(self, script: str, avatar_config: Dict[str, Any]) -> str:
+        """Build the cache key for a synthesis from everything that affects the generated video"""
+        avatar = self._map_avatar_config(avatar_config)
+        voice = avatar[f"voice_{avatar_config.get('language', 'english').lower()}"]
+        key_data = orjson.dumps([script, avatar['name'], avatar['style'], voice])
+        return hashlib.blake2b(key_data).hexdigest()
+    
+    def _get_cached_synthesis(self, cache_key: str) -> Optional[str]:
+        """Return the download URL of a previous identical synthesis if it is still fresh"""
+        cached = self._synthesis_cache.get(cache_key)
+        if cached is None:
+            return None
+        download_url, cached_at = cached
+        if time.monotonic() - cached_at > self.synthesis_cache_ttl:
+            # The Speech API result URL may no longer be valid
+            del self._synthesis_cache[cache_key]
+            return None
+        return download_url
+    
+    def _cache_synthesis(self, cache_key: str, download_url: str) -> None:
+        """Remember the download URL of a successful synthesis, evicting the oldest entry when full"""
+        if len(self._synthesis_cache) >= self.synthesis_cache_max_entries:
+            self._synthesis_cache.pop(next(iter(self._synthesis_cache)))
+        self._synthesis_cache[cache_key] = (download_url, time.monotonic())
+    
     async def submit_synthesis_job(self, job_id: str, script: str, avatar_config: Dict[str, Any]) -> bool:
         """Submit avatar synthesis job to Azure Speech API with retry logic"""
         url = f'{self.settings.speech_endpoint}/avatar/batchsyntheses/{job_id}?api-version={self.settings.speech_api_version}'
@@ -299,30 +349,28 @@ class VideoGeneratorService(BaseService):
         
         for attempt in range(self.max_retries):
             try:
-                headers = {'Content-Type': 'application/json'}
                 #headers.update(await self._get_authentication_headers())
                 
-                async with aiohttp.ClientSession() as session:
-                    async with session.put(url, json=payload, headers=headers) as response:
-                        if response.status < 400:
-                            self.logger.info(f'Avatar synthesis job submitted successfully for job {job_id}')
-                            return True
-                        elif self._is_retryable_error(response.status):
-                            error_text = await response.text()
-                            retry_after = self._extract_retry_after(dict(response.headers))
-                            
-                            if attempt < self.max_retries - 1:
-                                delay = self._calculate_retry_delay(attempt, retry_after)
-                                self.logger.warning(f'Retryable error submitting job {job_id}, retrying in {delay:.2f} seconds...')
-                                await asyncio.sleep(delay)
-                                continue
-                            else:
-                                self.logger.error(f'Failed to submit synthesis job {job_id} after {self.max_retries} attempts')
-                                return False
+                async with self.http_session.put(url, data=orjson.dumps(payload), headers=self._static_headers) as response:
+                    if response.status < 400:
+                        self.logger.info(f'Avatar synthesis job submitted successfully for job {job_id}')
+                        return True
+                    elif self._is_retryable_error(response.status):
+                        error_text = await response.text()
+                        retry_after = self._extract_retry_after(dict(response.headers))
+                        
+                        if attempt < self.max_retries - 1:
+                            delay = self._calculate_retry_delay(attempt, retry_after)
+                            self.logger.warning(f'Retryable error submitting job {job_id}, retrying in {delay:.2f} seconds...')
+                            await asyncio.sleep(delay)
+                            continue
                         else:
-                            error_text = await response.text()
-                            self.logger.error(f'Non-retryable error submitting synthesis job {job_id}: [{response.status}] {error_text}')
+                            self.logger.error(f'Failed to submit synthesis job {job_id} after {self.max_retries} attempts')
                             return False
+                    else:
+                        error_text = await response.text()
+                        self.logger.error(f'Non-retryable error submitting synthesis job {job_id}: [{response.status}] {error_text}')
+                        return False
                             
             except Exception as e:
                 if attempt < self.max_retries - 1:
@@ -344,25 +392,24 @@ class VideoGeneratorService(BaseService):
             try:
                #headers = await self._get_authentication_headers()
                 
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url) as response:
-                        if response.status < 400:
-                            data = await response.json()
-                            status = data['status']
-                            download_url = data.get('outputs', {}).get('result') if status == 'Succeeded' else None
-                            return status, download_url
-                        elif self._is_retryable_error(response.status):
-                            if attempt < self.max_retries - 1:
-                                delay = self._calculate_retry_delay(attempt)
-                                await asyncio.sleep(delay)
-                                continue
-                            else:
-                                self.logger.error(f'Failed to get synthesis status for {job_id} after {self.max_retries} attempts')
-                                return 'Error', None
+                async with self.http_session.get(url) as response:
+                    if response.status < 400:
+                        data = orjson.loads(await response.read())
+                        status = data['status']
+                        download_url = data.get('outputs', {}).get('result') if status == 'Succeeded' else None
+                        return status, download_url
+                    elif self._is_retryable_error(response.status):
+                        if attempt < self.max_retries - 1:
+                            delay = self._calculate_retry_delay(attempt)
+                            await asyncio.sleep(delay)
+                            continue
                         else:
-                            error_text = await response.text()
-                            self.logger.error(f'Non-retryable error getting synthesis status for {job_id}: {error_text}')
+                            self.logger.error(f'Failed to get synthesis status for {job_id} after {self.max_retries} attempts')
                             return 'Error', None
+                    else:
+                        error_text = await response.text()
+                        self.logger.error(f'Non-retryable error getting synthesis status for {job_id}: {error_text}')
+                        return 'Error', None
                             
             except Exception as e:
                 if attempt < self.max_retries - 1:
@@ -377,11 +424,11 @@ class VideoGeneratorService(BaseService):
     
     async def wait_for_completion(self, job_id: str, max_wait_time: int = 300) -> Tuple[str, Optional[str]]:
         """Wait for synthesis job to complete with timeout"""
-        start_time = time.time()
-        check_interval = 10
-        max_check_interval = 60
+        # Monotonic clock, so wall-clock adjustments cannot shorten or extend the timeout
+        start_time = time.monotonic()
+        check_interval = self.poll_initial_interval
         
-        while time.time() - start_time < max_wait_time:
+        while time.monotonic() - start_time < max_wait_time:
             status, download_url = await self.get_synthesis_status(job_id)
             
             if status == 'Succeeded':
@@ -393,9 +440,13 @@ class VideoGeneratorService(BaseService):
             elif status == 'Error':
                 return status, None
             else:
-                self.logger.info(f'Synthesis job {job_id} status: {status}')
-                await asyncio.sleep(check_interval)
-                check_interval = min(check_interval + 5, max_check_interval)
+                self.logger.debug('Synthesis job %s status: %s', job_id, status)
+                # Exponential backoff with jitter: short jobs are picked up quickly, long ones are polled less often
+                delay = check_interval + random.uniform(0, check_interval * self.poll_jitter_range)
+                # Do not sleep past the deadline, so the timeout is reported on time
+                remaining = max_wait_time - (time.monotonic() - start_time)
+                await asyncio.sleep(max(0.0, min(delay, remaining)))
+                check_interval = min(check_interval * self.poll_backoff_factor, self.poll_max_interval)
         
         self.logger.error(f'Synthesis job {job_id} timed out after {max_wait_time} seconds')
         return 'Timeout', None
@@ -436,9 +487,9 @@ class VideoGeneratorService(BaseService):
     async def cleanup(self):
         """Cleanup video generator specific resources"""
         try:
+            if hasattr(self, 'http_session'):
+                await self.http_session.close()
             if hasattr(self, 'cosmos_db'):
                 await self.cosmos_db.close()
-            if hasattr(self, 'credential'):
-                await self.credential.close()
         except Exception as e:
             self.logger.error(f"Error during video generator cleanup: {str(e)}")
\ No newline at end of file
@@ -1,10 +1,10 @@
 import tempfile
 import os
 import asyncio
+import multiprocessing
 import aiohttp # type: ignore
-from typing import Dict, Any
-from azure.identity.aio import DefaultAzureCredential # type: ignore
-from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+from concurrent.futures import ProcessPoolExecutor
 
 from common.services.base_service import BaseService
 from common.services.cosmos_db import CosmosDBService
@@ -16,43 +16,87 @@ from common.utils.config import Settings
 
 from utils.video_transformer import VideoTransformer
 
+# Read size for the avatar video download; large chunks keep event loop wake-ups and thread hops low
+AVATAR_DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# VideoTransformer of the current worker process, created on first use and reused for later slides
+_worker_transformer = None
+
+
+def _transform_video_worker(avatar_path, background_path, output_path, position, size, pause_before, pause_after, crop_aspect_ratio):
+    """Video transformation entry point run inside the process pool"""
+    global _worker_transformer
+    if _worker_transformer is None:
+        _worker_transformer = VideoTransformer()
+    _worker_transformer.transform_video(
+        avatar_path=avatar_path,
+        background_path=background_path,
+        output_path=output_path,
+        position=position,
+        size=size,
+        pause_before=pause_before,
+        pause_after=pause_after,
+        crop_aspect_ratio=crop_aspect_ratio
+    )
+
 
 class VideoTransformation(BaseService):
     """Service for customizing the video with avatar configuration"""
     
     def __init__(self, settings: Settings):
+        # Sized from settings rather than os.cpu_count(), which reports the host's cores, not the container's CPU limit
+        transform_workers = max(1, settings.video_transformation_workers)
         config = ServiceBusConfig.for_queue(settings.service_bus_video_transformation_queue_name)
+        # Take as many slides as there are workers so every core has a transform to run
+        config.max_message_count = transform_workers
         super().__init__(settings, "Video Transformation Service", config)
-        # Thread pool for CPU-bound operations
-        self.thread_pool = ThreadPoolExecutor(max_workers=2)
+        # Process pool for CPU-bound operations, so frame compositing is not limited by the GIL.
+        # Workers are spawned rather than forked from the process running the event loop.
+        self.process_pool = ProcessPoolExecutor(
+            max_workers=transform_workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
     
     async def _initialize(self):
         """Initialize video generator specific resources"""
-        self.credential = DefaultAzureCredential()
-        self.blob_storage = BlobStorageService(self.settings.storage_account_url)
+        self.blob_storage = BlobStorageService(self.settings.storage_account_url, credential=self.credential)
+        # Shared HTTP session so avatar downloads reuse pooled keep-alive connections
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=60)
+        )
         self.cosmos_db = CosmosDBService(
             self.settings.cosmos_db_endpoint,
             self.settings.cosmos_db_database_name,
+            credential=self.credential,
         )
     
-    def _transform_video_sync(self, avatar_path, background_path, output_path, position, size, pause_before, pause_after, crop_aspect_ratio):
-        """Synchronous video transformation to run in thread pool"""
-        transformer = VideoTransformer()
-        transformer.transform_video(
-            avatar_path=avatar_path,
-            background_path=background_path,
-            output_path=output_path,
-            position=position,
-            size=size,
-            pause_before=pause_before,
-            pause_after=pause_after,
-            crop_aspect_ratio=crop_aspect_ratio
+    async def _download_avatar_video(self, url: str, temp_files: List[str]) -> str:
+        """Stream the avatar video into a temporary file, writing large chunks off the event loop"""
+        async with self.http_session.get(url) as response:
+            if response.status != 200:
+                raise Exception(f"Failed to download avatar video: HTTP {response.status}")
+            
+            # Create temporary file for avatar video
+            fd, avatar_video_path = tempfile.mkstemp(suffix='.mp4')
+            temp_files.append(avatar_video_path)
+            with os.fdopen(fd, 'wb') as temp_avatar:
+                async for chunk in response.content.iter_chunked(AVATAR_DOWNLOAD_CHUNK_SIZE):
+                    await asyncio.to_thread(temp_avatar.write, chunk)
+        
+        return avatar_video_path
+
+    async def _download_background_image(self, video_message: VideoTransformationMessage, temp_files: List[str]) -> str:
+        """Stream the slide image from blob storage into a temporary file"""
+        # Create temporary file for background image and stream the blob straight into it
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_bg:
+            background_image_path = temp_bg.name
+            temp_files.append(background_image_path)
+        await self.blob_storage.download_to_file(
+            container_name=self.settings.blob_container_name,
+            blob_name=f"{video_message.ppt_id}/images/{video_message.index}.png",
+            file_path=background_image_path
         )
-    
-    def _read_file_sync(self, file_path):
-        """Synchronous file reading to run in thread pool"""
-        with open(file_path, 'rb') as f:
-            return f.read()
+        return background_image_path
 
     async def handle_message(self, message_data: Dict[str, Any]) -> None:
         """Handle video generation message"""
@@ -68,47 +112,27 @@ class VideoTransformation(BaseService):
             self.logger.info(f"Updating video generation status for PPT {video_message.ppt_id}, slide {video_message.index} to In Progress")
             await self._update_status(video_message, StatusEnum.PROCESSING)
 
-            # Download avatar video from URL
+            # Download avatar video from URL and background image from blob storage concurrently
             self.logger.info(f"Downloading avatar video from {video_message.avatar_video_url}")
-            avatar_video_path = None
-            async with aiohttp.ClientSession() as session:
-                async with session.get(video_message.avatar_video_url) as response:
-                    if response.status == 200:
-                        # Create temporary file for avatar video
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_avatar:
-                            avatar_video_path = temp_avatar.name
-                            temp_files.append(avatar_video_path)
-                            async for chunk in response.content.iter_chunked(8192):
-                                temp_avatar.write(chunk)
-                    else:
-                        raise Exception(f"Failed to download avatar video: HTTP {response.status}")
-
-            # Download background image from blob storage
             self.logger.info(f"Downloading background image for PPT {video_message.ppt_id}, slide {video_message.index}")
-            background_image = await self.blob_storage.download_file(
-                container_name=self.settings.blob_container_name,
-                blob_name=f"{video_message.ppt_id}/images/{video_message.index}.png"
+            avatar_video_path, background_image_path = await asyncio.gather(
+                self._download_avatar_video(video_message.avatar_video_url, temp_files),
+                self._download_background_image(video_message, temp_files)
             )
 
-            # Create temporary file for background image
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_bg:
-                background_image_path = temp_bg.name
-                temp_files.append(background_image_path)
-                temp_bg.write(background_image)
-
             # Create temporary file for output video
             with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_output:
                 output_video_path = temp_output.name
                 temp_files.append(output_video_path)
 
-            # Transform the video in a thread pool to avoid blocking the event loop
+            # Transform the video in a process pool to avoid blocking the event loop
             self.logger.info(f"Transforming video for PPT {video_message.ppt_id}, slide {video_message.index}")
             
-            # Run the CPU-intensive video transformation in a thread pool
-            loop = asyncio.get_event_loop()
+            # Run the CPU-intensive video transformation in a worker process
+            loop = asyncio.get_running_loop()
             await loop.run_in_executor(
-                self.thread_pool,
-                self._transform_video_sync,
+                self.process_pool,
+                _transform_video_worker,
                 avatar_video_path,
                 background_image_path,
                 output_video_path,
@@ -119,26 +143,16 @@ class VideoTransformation(BaseService):
                 9/16
             )
 
-            # Read the output video file as bytes in thread pool
-            output_video_bytes = await loop.run_in_executor(
-                self.thread_pool,
-                self._read_file_sync,
-                output_video_path
-            )
-
             # Upload the transformed video to blob storage
             self.logger.info(f"Uploading transformed video for PPT {video_message.ppt_id}, slide {video_message.index}")
-            await self.blob_storage.upload_file(
+            await self.blob_storage.upload_from_file(
                 container_name=self.settings.blob_container_name,
                 blob_name=f"{video_message.ppt_id}/videos/{video_message.video_id}/{video_message.index}.mp4",
-                file_data=output_video_bytes
+                file_path=output_video_path
             )
 
-            # Update Cosmos DB status to Completed
+            # Mark the slide Completed, update the completed slides count and check if all videos are ready for concatenation
             self.logger.info(f"Updating video generation status for PPT {video_message.ppt_id}, slide {video_message.index} to Completed")
-            await self._update_status(video_message, StatusEnum.COMPLETED)
-
-            # Update completed slides count and check if all videos are ready for concatenation
             await self._update_completed_slides(video_message)
 
         except Exception as e:
@@ -170,77 +184,41 @@ class VideoTransformation(BaseService):
     
     async def _update_status(self, video_message: VideoTransformationMessage, status: StatusEnum, status_type: str = 'both'):
         """Update video generation status in Cosmos DB"""
-        if status_type in ['transformation_status', 'both']:
-            await self.cosmos_db.update_slide_video_status(
-                ppt_id=video_message.ppt_id,
-                user_id=video_message.user_id,
-                video_id=video_message.video_id,
-                slide_index=video_message.index,
-                status_type='transformation_status',
-                new_status=status,
-            )
-        
-        if status_type in ['status', 'both']:
-            await self.cosmos_db.update_slide_video_status(
-                ppt_id=video_message.ppt_id,
-                user_id=video_message.user_id,
-                video_id=video_message.video_id,
-                slide_index=video_message.index,
-                status_type='status',
-                new_status=status,
-            )
+        status_types = ['transformation_status', 'status'] if status_type == 'both' else [status_type]
+        # Both statuses are written in a single patch
+        await self.cosmos_db.update_slide_video_status(
+            ppt_id=video_message.ppt_id,
+            user_id=video_message.user_id,
+            video_id=video_message.video_id,
+            slide_index=video_message.index,
+            status_type=status_types,
+            new_status=status,
+        )
 
     async def _update_completed_slides(self, video_message: VideoTransformationMessage) -> None:
-        """Update completed slides count and check if all videos are ready for concatenation using ETag"""
-        max_retries = 5
-        retry_count = 0
-        while retry_count < max_retries:
-            try:
-                # Get the PowerPoint record with ETag
-                powerpoint_record, etag = await self.cosmos_db.get_powerpoint_record(
-                    video_message.ppt_id, 
-                    video_message.user_id
-                )
-            
-                if not powerpoint_record:
-                    self.logger.error(f"PowerPoint record not found: {video_message.ppt_id}")
-                    return
-            
-                # Find the video information
-                video_info = None
-                for vi in powerpoint_record.video_information:
-                    if vi.video_id == video_message.video_id:
-                        video_info = vi
-                        break
+        """Mark the slide completed, update completed slides count and check if all videos are ready for concatenation"""
+        try:
+            # Status and counter are updated server-side in one patch, so concurrent slides need no ETag read/retry loop
+            video_info = await self.cosmos_db.complete_slide_video(
+                video_message.ppt_id,
+                video_message.user_id,
+                video_message.video_id,
+                video_message.index,
+                ['transformation_status', 'status']
+            )
             
-                if not video_info:
-                    self.logger.error(f"Video information not found for video_id: {video_message.video_id}")
-                    return
+            if not video_info:
+                return
             
-                # Check if all slides for this video are completed (both generation and transformation)
-                video_info.completed_slides += 1
+            self.logger.info(f"Updated completed slides for video {video_message.video_id}: {video_info.completed_slides}/{video_info.total_slides}")
             
-                self.logger.info(f"Updating completed slides for video {video_message.video_id}: {video_info.completed_slides}/{video_info.total_slides}")
-                await self.cosmos_db.update_powerpoint_record(powerpoint_record, etag)
-
-                # Only update if the completed slides count has actually changed
-                if video_info.completed_slides == video_info.total_slides:
-
-                    self.logger.debug(f"Completed slides for video {video_message.video_id}: {video_info.completed_slides}/{video_info.total_slides}")
-                    # Update the video status to COMPLETED
-
-                    await self.send_concatenation_message(video_message)
-                    return
-                return
+            # Exactly one slide observes the final count, so the concatenation is requested once
+            if video_info.completed_slides == video_info.total_slides:
+                await self.send_concatenation_message(video_message)
                 
-            except Exception as e:
-                if "access condition" in str(e).lower() or "412" in str(e):
-                    # Concurrency conflict - another process updated the document
-                    retry_count += 1
-                    self.logger.warning(f"Concurrency conflict on attempt {retry_count}, retrying...")
-                    continue  # Retry the operation
-                self.logger.error(f"Error updating completed slides and checking concatenation: {str(e)}")
-                raise
+        except Exception as e:
+            self.logger.error(f"Error updating completed slides and checking concatenation: {str(e)}")
+            raise
     
     
     async def send_concatenation_message(self, original_message: VideoTransformationMessage) -> None:
@@ -269,11 +247,13 @@ class VideoTransformation(BaseService):
     async def cleanup(self):
         """Cleanup video generator specific resources"""
         try:
+            if hasattr(self, 'http_session'):
+                await self.http_session.close()
             if hasattr(self, 'cosmos_db'):
                 await self.cosmos_db.close()
-            if hasattr(self, 'credential'):
-                await self.credential.close()
-            if hasattr(self, 'thread_pool'):
-                self.thread_pool.shutdown(wait=True)
+            if hasattr(self, 'blob_storage'):
+                await self.blob_storage.close()
+            if hasattr(self, 'process_pool'):
+                self.process_pool.shutdown(wait=True)
         except Exception as e:
             self.logger.error(f"Error during video generator cleanup: {str(e)}")
\ No newline at end of file